@@ -0,0 +1,134 @@
+"""benchmarks the fast paths against the default conversion and checks
+that they produce the same geometry."""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .compare import compare, load_dxf, print_results
+from .synth import write_board
+
+# name, extra arguments, layers that are expected to differ, tolerances
+VARIANTS = [
+    # the layer union at once, as before the net by net union
+    ("flat", ["--flat"], [], {}),
+    ("stream", ["--stream"], [], {}),
+    ("cache", ["--cache"], [], {}),
+    ("tile", ["--tile", "20"], [], {}),
+    ("chunk", ["--chunk", "2000"], ["TopPoly", "BottomPoly"], {}),
+    # snapping merges near-coincident vertices
+    ("grid", ["--grid", "0.001"], [], {"count_tolerance": 0.1}),
+]
+
+# synthetic boards: name, cols, rows
+BOARDS = [("small", 4, 3), ("medium", 12, 8)]
+
+
+def convert(board, output, args):
+    """runs the converter, returns (seconds, peak memory in MB or None)"""
+    command = [sys.executable, "-m", "brd2dxf", board, "--output", output, *args]
+    with tempfile.TemporaryFile(mode="w+") as errors:
+        started = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=errors)
+        peak = None
+        if hasattr(os, "wait4"):
+            # wait4 gives the resource usage of this run only
+            _pid, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak = usage.ru_maxrss / (1024 if sys.platform != "darwin" else 1024**2)
+        else:
+            process.wait()
+        seconds = time.perf_counter() - started
+        if process.returncode:
+            errors.seek(0)
+            raise RuntimeError(f"{' '.join(command)} failed:\n{errors.read()}")
+    return (seconds, peak)
+
+
+def memory(peak):
+    return "n/a" if peak is None else f"{peak:.0f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="converts boards with every fast path and compares the "
+        "results with the default conversion"
+    )
+    parser.add_argument(
+        "boards",
+        help="brd files (default: synthetic boards)",
+        type=str,
+        nargs="*",
+    )
+    parser.add_argument(
+        "--variant",
+        help="only run this fast path",
+        type=str,
+        default=[],
+        action="append",
+        choices=[variant[0] for variant in VARIANTS],
+    )
+    parser.add_argument(
+        "--keep", help="write the boards and dxf files to this directory", type=str
+    )
+    args = parser.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="brd2dxf-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    boards = []
+    for board in args.boards:
+        # the cache variant writes next to the board, work on a copy
+        boards.append(shutil.copy(board, workdir))
+    if not boards:
+        for name, cols, rows in BOARDS:
+            boards.append(os.path.join(workdir, f"{name}.brd"))
+            write_board(boards[-1], cols, rows)
+
+    variants = [
+        variant
+        for variant in VARIANTS
+        if not args.variant or variant[0] in args.variant
+    ]
+    failed = []
+    for board in boards:
+        name = os.path.splitext(os.path.basename(board))[0]
+        baseline = os.path.join(workdir, f"{name}.dxf")
+        seconds, peak = convert(board, baseline, [])
+        print(f"{name}: default {seconds:.2f}s, {memory(peak)}")
+        # all conversions first, the peak memory of a child starts at the
+        # size of this process when it forks
+        runs = []
+        for variant, variant_args, _ignore, _tolerances in variants:
+            output = os.path.join(workdir, f"{name}.{variant}.dxf")
+            if variant == "cache":
+                # the first run writes the cache
+                convert(board, output, variant_args)
+            runs.append((output, *convert(board, output, variant_args)))
+        reference = load_dxf(baseline)
+        for (variant, _args, ignore, tolerances), (output, seconds, peak) in zip(
+            variants, runs
+        ):
+            results = compare(reference, load_dxf(output), ignore=ignore, **tolerances)
+            ok = all(result["ok"] for result in results)
+            print(
+                f"  {'ok  ' if ok else 'FAIL'} {variant}: {seconds:.2f}s, {memory(peak)}"
+                + (f" (not compared: {', '.join(ignore)})" if ignore else "")
+            )
+            if not ok:
+                print_results([result for result in results if not result["ok"]])
+                failed.append(f"{name} {variant}")
+
+    if args.keep is None:
+        shutil.rmtree(workdir)
+    if failed:
+        print(f"differences: {', '.join(failed)}")
+        sys.exit(1)
+    print("all fast paths match the default conversion")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""compiled board tables and the on-disk board cache."""
+
+import hashlib
+import json
+import mmap
+import os
+
+import numpy
+import xmltodict
+
+CACHE_MAGIC = b"BRD2DXF\x00"
+CACHE_VERSION = 1
+CACHE_ALIGN = 64
+
+# numeric tables of a compiled board, strings are indices into board["strings"]
+dtypes = {
+    "plain": [
+        ("x1", "f8"),
+        ("y1", "f8"),
+        ("x2", "f8"),
+        ("y2", "f8"),
+        ("width", "f8"),
+        ("layer", "i4"),
+    ],
+    "wires": [
+        ("x1", "f8"),
+        ("y1", "f8"),
+        ("x2", "f8"),
+        ("y2", "f8"),
+        ("width", "f8"),
+        ("layer", "i4"),
+        ("signal", "i4"),
+    ],
+    "vias": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("drill", "f8"),
+        ("size", "f8"),
+        ("signal", "i4"),
+    ],
+    "polygons": [
+        ("layer", "i4"),
+        ("signal", "i4"),
+        ("width", "f8"),
+        ("isolate", "f8"),
+        ("thermals", "i1"),
+        ("rank", "i4"),
+        ("start", "i4"),
+        ("end", "i4"),
+    ],
+    "vertices": [("x", "f8"), ("y", "f8")],
+    "contacts": [("signal", "i4"), ("element", "i4"), ("pad", "i4")],
+    "elements": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("rot", "f8"),
+        ("mirror", "i1"),
+        ("name", "i4"),
+        ("package", "i4"),
+    ],
+    "packages": [
+        ("name", "i4"),
+        ("library", "i4"),
+        ("smd_start", "i4"),
+        ("smd_end", "i4"),
+        ("pad_start", "i4"),
+        ("pad_end", "i4"),
+        ("rectangle_start", "i4"),
+        ("rectangle_end", "i4"),
+        ("wire_start", "i4"),
+        ("wire_end", "i4"),
+        ("circle_start", "i4"),
+        ("circle_end", "i4"),
+        ("text_start", "i4"),
+        ("text_end", "i4"),
+    ],
+    "smds": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("dx", "f8"),
+        ("dy", "f8"),
+        ("rot", "f8"),
+        ("hasrot", "i1"),
+        ("name", "i4"),
+        ("layer", "i4"),
+    ],
+    "pads": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("drill", "f8"),
+        ("diameter", "f8"),
+        ("rot", "f8"),
+        ("hasrot", "i1"),
+        ("shape", "i4"),
+        ("name", "i4"),
+    ],
+    "rectangles": [
+        ("x1", "f8"),
+        ("y1", "f8"),
+        ("x2", "f8"),
+        ("y2", "f8"),
+        ("layer", "i4"),
+    ],
+    "package_wires": [
+        ("x1", "f8"),
+        ("y1", "f8"),
+        ("x2", "f8"),
+        ("y2", "f8"),
+        ("width", "f8"),
+        ("layer", "i4"),
+    ],
+    "circles": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("radius", "f8"),
+        ("width", "f8"),
+        ("layer", "i4"),
+    ],
+    "texts": [
+        ("x", "f8"),
+        ("y", "f8"),
+        ("size", "f8"),
+        ("layer", "i4"),
+        ("text", "i4"),
+    ],
+}
+
+# package contents in the order of the packages table: (table, xml tag)
+package_items = [
+    ("smds", "smd"),
+    ("pads", "pad"),
+    ("rectangles", "rectangle"),
+    ("package_wires", "wire"),
+    ("circles", "circle"),
+    ("texts", "text"),
+]
+
+
+def _aslist(value):
+    """xmltodict returns a dict for single childs and None for empty ones"""
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value]
+    return value
+
+
+def _rotation(value):
+    """splits an eagle rotation (R90, MR180, SMR270) into mirror flag and angle"""
+    return ("M" in value, float(value.lstrip("SMR") or 0.0))
+
+
+def _package_row(kind, item, intern):
+    if kind == "smds":
+        mirror, rot = _rotation(item.get("@rot", ""))
+        return (
+            float(item["@x"]),
+            float(item["@y"]),
+            float(item["@dx"]),
+            float(item["@dy"]),
+            rot,
+            "@rot" in item,
+            intern(item["@name"]),
+            int(item.get("@layer", 1)),
+        )
+    if kind == "pads":
+        mirror, rot = _rotation(item.get("@rot", ""))
+        drill = float(item["@drill"])
+        return (
+            float(item["@x"]),
+            float(item["@y"]),
+            drill,
+            float(item.get("@diameter", drill * 1.5)),
+            rot,
+            "@rot" in item,
+            intern(item.get("@shape", "round")),
+            intern(item["@name"]),
+        )
+    if kind == "rectangles":
+        return (
+            float(item["@x1"]),
+            float(item["@y1"]),
+            float(item["@x2"]),
+            float(item["@y2"]),
+            int(item["@layer"]),
+        )
+    if kind == "package_wires":
+        return (
+            float(item["@x1"]),
+            float(item["@y1"]),
+            float(item["@x2"]),
+            float(item["@y2"]),
+            float(item["@width"]),
+            int(item["@layer"]),
+        )
+    if kind == "circles":
+        return (
+            float(item["@x"]),
+            float(item["@y"]),
+            float(item["@radius"]),
+            float(item.get("@width", 0.0)),
+            int(item["@layer"]),
+        )
+    return (
+        float(item["@x"]),
+        float(item["@y"]),
+        float(item["@size"]),
+        int(item["@layer"]),
+        intern(item.get("#text", "")),
+    )
+
+
+def compile_board(xmldict):
+    """converts the parsed xml-tree into numeric tables"""
+    strings = {}
+
+    def intern(value):
+        return strings.setdefault(value, len(strings))
+
+    intern("")
+    drawing = xmldict["eagle"]["drawing"]
+    board = drawing["board"]
+    tables = {name: [] for name in dtypes}
+
+    layers = []
+    for layer in _aslist(drawing["layers"]["layer"]):
+        layers.append(
+            {
+                "@number": int(layer["@number"]),
+                "@name": layer["@name"],
+                "@color": layer["@color"],
+            }
+        )
+
+    for wire in _aslist((board.get("plain") or {}).get("wire")):
+        tables["plain"].append(
+            (
+                float(wire["@x1"]),
+                float(wire["@y1"]),
+                float(wire["@x2"]),
+                float(wire["@y2"]),
+                float(wire["@width"]),
+                int(wire["@layer"]),
+            )
+        )
+
+    for signal in _aslist((board.get("signals") or {}).get("signal")):
+        signal_name = intern(signal.get("@name", ""))
+        for contactref in _aslist(signal.get("contactref")):
+            tables["contacts"].append(
+                (
+                    signal_name,
+                    intern(contactref["@element"]),
+                    intern(contactref["@pad"]),
+                )
+            )
+        for polygon in _aslist(signal.get("polygon")):
+            start = len(tables["vertices"])
+            for point in _aslist(polygon.get("vertex")):
+                tables["vertices"].append((float(point["@x"]), float(point["@y"])))
+            tables["polygons"].append(
+                (
+                    int(polygon["@layer"]),
+                    signal_name,
+                    float(polygon.get("@width", 0.0)),
+                    float(polygon.get("@isolate", 0.0)),
+                    polygon.get("@thermals", "yes") != "no",
+                    int(polygon.get("@rank", 1)),
+                    start,
+                    len(tables["vertices"]),
+                )
+            )
+        for via in _aslist(signal.get("via")):
+            drill = float(via["@drill"])
+            size = 1
+            if "@diameter" in via:
+                size = float(via["@diameter"])
+            elif "@extent" in via:
+                size = drill / 2 + float(via["@extent"].split("-")[1]) / 100
+            tables["vias"].append(
+                (float(via["@x"]), float(via["@y"]), drill, size, signal_name)
+            )
+        for wire in _aslist(signal.get("wire")):
+            tables["wires"].append(
+                (
+                    float(wire["@x1"]),
+                    float(wire["@y1"]),
+                    float(wire["@x2"]),
+                    float(wire["@y2"]),
+                    float(wire["@width"]),
+                    int(wire["@layer"]),
+                    signal_name,
+                )
+            )
+
+    packages = {}
+    for library in _aslist((board.get("libraries") or {}).get("library")):
+        for package in _aslist((library.get("packages") or {}).get("package")):
+            key = (library["@name"], package["@name"])
+            if key in packages:
+                continue
+            row = [intern(package["@name"]), intern(library["@name"])]
+            for kind, tag in package_items:
+                row.append(len(tables[kind]))
+                for item in _aslist(package.get(tag)):
+                    tables[kind].append(_package_row(kind, item, intern))
+                row.append(len(tables[kind]))
+            packages[key] = len(tables["packages"])
+            tables["packages"].append(tuple(row))
+
+    for element in _aslist((board.get("elements") or {}).get("element")):
+        mirror, rot = _rotation(element.get("@rot", ""))
+        tables["elements"].append(
+            (
+                float(element["@x"]),
+                float(element["@y"]),
+                rot,
+                mirror,
+                intern(element["@name"]),
+                packages.get((element["@library"], element["@package"]), -1),
+            )
+        )
+
+    compiled = {"strings": list(strings), "layers": layers}
+    for name, rows in tables.items():
+        compiled[name] = numpy.array(rows, dtype=dtypes[name])
+    return compiled
+
+
+def _source_info(filename):
+    stat = os.stat(filename)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _source_hash(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def save_board(cachefile, board, source):
+    """writes a compiled board: magic, header-length, json-header, aligned arrays"""
+    header = {
+        "version": CACHE_VERSION,
+        "source": source,
+        "strings": board["strings"],
+        "layers": board["layers"],
+        "arrays": {},
+    }
+    offset = 0
+    for name in dtypes:
+        header["arrays"][name] = {"offset": offset, "count": len(board[name])}
+        offset += -(-board[name].nbytes // CACHE_ALIGN) * CACHE_ALIGN
+    header_data = json.dumps(header).encode()
+    data_start = (
+        -(-(len(CACHE_MAGIC) + 8 + len(header_data)) // CACHE_ALIGN) * CACHE_ALIGN
+    )
+
+    tmpfile = f"{cachefile}.tmp"
+    with open(tmpfile, "wb") as cache:
+        cache.write(CACHE_MAGIC)
+        cache.write(len(header_data).to_bytes(8, "little"))
+        cache.write(header_data)
+        for name in dtypes:
+            cache.seek(data_start + header["arrays"][name]["offset"])
+            cache.write(numpy.ascontiguousarray(board[name]).tobytes())
+        cache.truncate(data_start + offset)
+    os.replace(tmpfile, cachefile)
+
+
+def update_source(cachefile, board, source):
+    """stores new source info in the cache header
+
+    the header is rewritten in place if it still ends before the arrays,
+    otherwise the whole cache is written again.
+    """
+    with open(cachefile, "r+b") as cache:
+        cache.seek(len(CACHE_MAGIC))
+        header_size = int.from_bytes(cache.read(8), "little")
+        header = json.loads(cache.read(header_size))
+        header["source"] = source
+        header_data = json.dumps(header).encode()
+        data_start = -(-(len(CACHE_MAGIC) + 8 + header_size) // CACHE_ALIGN)
+        new_start = -(-(len(CACHE_MAGIC) + 8 + len(header_data)) // CACHE_ALIGN)
+        if new_start == data_start:
+            cache.seek(len(CACHE_MAGIC))
+            cache.write(len(header_data).to_bytes(8, "little"))
+            cache.write(header_data)
+            return
+    save_board(cachefile, board, source)
+
+
+def load_board(cachefile):
+    """maps a compiled board into memory, returns (board, source-info)"""
+    with open(cachefile, "rb") as cache:
+        if cache.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError(f"not a board cache: {cachefile}")
+        header_size = int.from_bytes(cache.read(8), "little")
+        header = json.loads(cache.read(header_size))
+        if header["version"] != CACHE_VERSION:
+            raise ValueError(f"board cache version mismatch: {cachefile}")
+        data_start = (
+            -(-(len(CACHE_MAGIC) + 8 + header_size) // CACHE_ALIGN) * CACHE_ALIGN
+        )
+        mapping = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+
+    board = {"strings": header["strings"], "layers": header["layers"]}
+    for name, dtype in dtypes.items():
+        info = header["arrays"][name]
+        board[name] = numpy.frombuffer(
+            mapping,
+            dtype=numpy.dtype(dtype),
+            count=info["count"],
+            offset=data_start + info["offset"],
+        )
+    return board, header["source"]
+
+
+def read_board(filename, cache=False):
+    """reads a brd-file, optional using/updating the compiled cache next to it"""
+    cachefile = f"{filename}.cache"
+    if cache and os.path.isfile(cachefile):
+        try:
+            board, source = load_board(cachefile)
+        except (ValueError, KeyError, OSError) as error:
+            print(f"ignoring board cache: {error}")
+        else:
+            info = _source_info(filename)
+            if (
+                info["mtime_ns"] == source["mtime_ns"]
+                and info["size"] == source["size"]
+            ):
+                print(f"using board cache: {cachefile}")
+                return board
+            if (
+                info["size"] == source["size"]
+                and _source_hash(filename) == source["sha1"]
+            ):
+                print(f"using board cache (unchanged content): {cachefile}")
+                # the next run can skip the hash again
+                info["sha1"] = source["sha1"]
+                update_source(cachefile, board, info)
+                return board
+
+    xmldata = open(filename, "r").read()
+    board = compile_board(xmltodict.parse(xmldata))
+    if cache:
+        source = _source_info(filename)
+        source["sha1"] = _source_hash(filename)
+        print(f"writing board cache: {cachefile}")
+        save_board(cachefile, board, source)
+    return board
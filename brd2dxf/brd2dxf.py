@@ -1,13 +1,24 @@
 import argparse
 import math
+import os
+import re
+import time
 
 import ezdxf
 import shapely
-import xmltodict
-from ezdxf import zoom
+from ezdxf import bbox, zoom
 from shapely.geometry import Polygon
 from shapely.ops import unary_union
 
+from . import report
+from .board import read_board
+from .drc import check_layer, write_report
+from .drills import DrillTable, write_excellon
+from .dxfstream import DxfStream
+from .pour import compute_pours
+from .primitives import PrimitiveStore
+from .union import ChunkedUnion, net_union, part_nets, snap, tiled_union
+
 selections = {
     "top_copper": {"color": 1, "layers": ["Top"]},
     "bottom_copper": {"color": 5, "layers": ["Bottom"]},
@@ -19,6 +30,7 @@ selections = {
     "board": {"color": 3, "layers": ["Dimension"]},
     "top_smd": {"color": 3, "layers": ["TopSMD"]},
     "bottom_smd": {"color": 3, "layers": ["BottomSMD"]},
+    "drc": {"color": 6, "layers": ["DRC"]},
 }
 
 dxfcolors = {
@@ -44,14 +56,22 @@ layerdata = {}
 layers_in_use = set()
 polygons = {}
 polygon_areas = {}
-signals2pads = {}
+pours = []
+net_layers = {}
+pads2signals = {}
+nets = {"": 0}
+pad_nets = set()
+strings = []
 plain = []
+outline = []
+drill_table = DrillTable()
 fill_areas = False
-
-
-def angle_of_line(p_1, p_2):
-    """gets the angle of a single line."""
-    return math.atan2(p_2[1] - p_1[1], p_2[0] - p_1[0])
+tile_size = 0.0
+jobs = 0
+chunk_size = 0
+grid_size = 0.0
+simplify_tolerance = 0.0
+flat_union = False
 
 
 def rotate_point(
@@ -70,83 +90,207 @@ def rotate_point(
     return (new_x, new_y)
 
 
-def draw_circle(center, radius, steps=18):
-    """draws an circle"""
-    points = []
-    step = math.pi * 2 / steps
-    angle = -step / 2
-    while angle < math.pi * 2 + step:
-        p_x = center[0] + radius * math.sin(angle)
-        p_y = center[1] - radius * math.cos(angle)
-        points.append((p_x, p_y))
-        angle += step
-    return points
+def board_bounds():
+    """bounding box of the board outline (plain wires on Dimension)"""
+    if not outline:
+        return None
+    xs = [point[0] for point in outline]
+    ys = [point[1] for point in outline]
+    return (min(xs), min(ys), max(xs), max(ys))
 
 
-def signal_add_wire(msp, wire, signal_name):
-    x1 = float(wire["@x1"])
-    y1 = float(wire["@y1"])
-    x2 = float(wire["@x2"])
-    y2 = float(wire["@y2"])
-    lw = float(wire["@width"])
-    layer = layerdata[wire["@layer"]]["@name"]
-    radius = lw / 2
-    p_from = (x1, y1)
-    p_to = (x2, y2)
-    line_angle = angle_of_line(p_from, p_to)
+def merge(store, offset=0.0, per_net=None):
+    """unions the (offset) polygons of a layer, chunked or tiled if selected
 
-    if layer not in polygons:
-        polygons[layer] = []
-
-    polygons[layer].append(Polygon(draw_circle((x1, y1), radius)))
-    polygons[layer].append(Polygon(draw_circle((x2, y2), radius)))
-    x_out_from = p_from[0] + radius * math.sin(line_angle)
-    y_out_from = p_from[1] - radius * math.cos(line_angle)
-    x_in_from = p_from[0] + radius * math.sin(line_angle + math.pi)
-    y_in_from = p_from[1] - radius * math.cos(line_angle + math.pi)
-    x_out_to = p_to[0] + radius * math.sin(line_angle)
-    y_out_to = p_to[1] - radius * math.cos(line_angle)
-    x_in_to = p_to[0] + radius * math.sin(line_angle + math.pi)
-    y_in_to = p_to[1] - radius * math.cos(line_angle + math.pi)
-    polygons[layer].append(
-        Polygon(
-            [
-                (x_in_from, y_in_from),
-                (x_in_to, y_in_to),
-                (x_out_to, y_out_to),
-                (x_out_from, y_out_from),
-            ]
+    by default the nets are unioned one by one and combined, per_net (a
+    dict) receives the union of every net then. --flat unions the layer at
+    once.
+    """
+    if store.accumulator is not None:
+        store.flush()
+        report.stats(
+            f"{store.accumulator.polygons} polygons merged in "
+            f"{store.accumulator.chunks} chunks"
+        )
+        return store.accumulator.result(offset)
+    geoms, owners = store.geometries(store.visible())
+    if offset:
+        geoms = shapely.buffer(geoms, offset, quad_segs=16)
+    if not grid_size:
+        if tile_size:
+            return tiled_union(geoms, board_bounds(), tile_size, jobs)
+        if flat_union:
+            return unary_union(geoms)
+        u, nets_union = net_union(geoms, store.net_ids(owners), jobs)
+        if per_net is not None:
+            per_net.update(nets_union)
+        return u
+
+    if report.enabled:
+        with report.Timer() as timer:
+            u = unary_union(geoms)
+        report.stats(
+            f"without snapping: {shapely.get_num_coordinates(geoms).sum()} -> "
+            f"{shapely.get_num_coordinates(u)} vertices, union in {timer.seconds:.2f}s"
         )
+    with report.Timer() as timer:
+        geoms = snap(geoms, grid_size)
+        if tile_size:
+            u = tiled_union(geoms, board_bounds(), tile_size, jobs, grid_size)
+        else:
+            u = shapely.union_all(geoms, grid_size=grid_size)
+    report.stats(
+        f"with snapping: {shapely.get_num_coordinates(geoms).sum()} -> "
+        f"{shapely.get_num_coordinates(u)} vertices, union in {timer.seconds:.2f}s"
+    )
+    return u
+
+
+def outline_rings(geom, holes=False):
+    """point lists of the polygon rings written as lines"""
+    rings = []
+    # collections of multipolygons (the nets of a layer) are flattened too
+    for poly in shapely.get_parts(shapely.get_parts(geom)).tolist():
+        if not isinstance(poly, Polygon) or poly.is_empty:
+            continue
+        rings.append(list(poly.exterior.coords))
+        if holes:
+            rings += [list(ring.coords) for ring in poly.interiors]
+    return rings
+
+
+def simplify(geom, layer, holes=False):
+    """simplifies the outlines of a layer (topology preserving)"""
+    if not simplify_tolerance:
+        return geom
+    before = shapely.get_num_coordinates(geom)
+    lines = sum(len(points) for points in outline_rings(geom, holes))
+    # collinear vertices are within any tolerance and dropped as well
+    geom = shapely.simplify(geom, simplify_tolerance, preserve_topology=True)
+    after = shapely.get_num_coordinates(geom)
+    print(
+        f"simplify {layer}: {before} -> {after} vertices, "
+        f"{lines} -> {sum(len(points) for points in outline_rings(geom, holes))} lines"
     )
+    return geom
+
+
+def net_layer(layer, net_name):
+    """dxf layer of a net on a copper layer"""
+    if not net_name:
+        return layer
+    # characters not allowed in dxf layer names
+    name = layer + "_" + re.sub(r'[<>/\\":;?*|=,`\s]', "_", net_name)
+    net_layers[name] = layer
+    return name
+
+
+def stream_writer(filename, board_layers, poly_layers, simple, selected, offsets):
+    """streaming writer with the layers and selections of the ezdxf output
+
+    poly_layers maps the layers with polygons to their color, the fill of
+    the polygons goes on <layer>Poly. with more than one offset (panel) the
+    board is written once as a block and inserted at every offset.
+    """
+    colors = {}
+    for layer in board_layers:
+        name = layer["@name"]
+        colors[name] = dxfcolors.get(name, int(layer["@color"]))
+    for name, color in poly_layers.items():
+        colors.setdefault(f"{name}Poly", color)
+    for name, color in [
+        ("Top_inner", 1),
+        ("Bottom_inner", 5),
+        ("TopPoly", 1),
+        ("BottomPoly", 5),
+        ("TopSMD", 1),
+        ("BottomSMD", 5),
+        ("Drills", 2),
+        ("DRC", 6),
+    ]:
+        colors.setdefault(name, color)
+    rename = {name: name for name in colors}
+    if simple:
+        colors = {select: selections[select]["color"] for select in selections}
+        rename = {
+            layer: select
+            for select in selections
+            for layer in selections[select]["layers"]
+        }
+    if selected:
+        colors = {name: color for name, color in colors.items() if name in selected}
+        rename = {layer: name for layer, name in rename.items() if name in selected}
+    return DxfStream(filename, colors, rename, offsets if len(offsets) > 1 else None)
+
+
+def panel_size(value):
+    """parses the COLSxROWS of --panel"""
+    try:
+        cols, rows = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS, got '{value}'")
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"expected COLSxROWS, got '{value}'")
+    return (cols, rows)
+
+
+def panel_offsets(cols, rows, step_x, step_y):
+    """offsets of the board copies, row by row in alternating direction"""
+    offsets = []
+    for row in range(rows):
+        order = range(cols) if row % 2 == 0 else reversed(range(cols))
+        offsets += [(col * step_x, row * step_y) for col in order]
+    return offsets
+
+
+def net_id(signal_name):
+    """returns the numeric id of a net"""
+    return nets.setdefault(signal_name, len(nets))
+
+
+def pad_net_id(signal_name, element_name, pad_name):
+    """net id of a pad, unconnected pads are nets of their own (for the drc)"""
+    if signal_name:
+        return net_id(signal_name)
+    net = net_id(f"{element_name}.{pad_name}")
+    pad_nets.add(net)
+    return net
+
+
+def layer_store(layer):
+    """returns the primitive store of a layer"""
+    if layer not in polygons:
+        polygons[layer] = PrimitiveStore()
+        if chunk_size:
+            offsets = (0.0, 0.1) if layer in ["Top", "Bottom"] else (0.0,)
+            polygons[layer].accumulate(
+                ChunkedUnion(offsets, grid_size or None), chunk_size
+            )
+    return polygons[layer]
+
+
+def signal_add_wire(msp, wire, signal_name):
+    x1, y1, x2, y2, lw, layer_number, _signal = wire
+    layer = layerdata[layer_number]["@name"]
+    layer_store(layer).add_segment(x1, y1, x2, y2, lw / 2, net_id(signal_name))
 
 
 def signal_add_via(msp, via, signal_name):
-    x = float(via["@x"])
-    y = float(via["@y"])
-    drill = float(via["@drill"])
-    size = 1
-    if "@diameter" in via:
-        size = float(via["@diameter"])
-    elif "@extent" in via:
-        size = drill / 2 + float(via["@extent"].split("-")[1]) / 100
-    msp.add_circle((x, y), drill / 2, dxfattribs={"layer": "Drills"})
+    x, y, drill, size, _signal = via
+    drill_table.add(x, y, drill)
     layers_in_use.add("Drills")
 
     for layer in ["Top", "Bottom"]:
         area_name = f"{layer}_{signal_name}"
-        if not fill_areas or area_name not in polygon_areas:  # TODO: check if inside
-            if layer not in polygons:
-                polygons[layer] = []
-            polygons[layer].append(Polygon(draw_circle((x, y), size)))
+        hidden = fill_areas and area_name in polygon_areas  # TODO: check if inside
+        layer_store(layer).add_circle(
+            x, y, size, net=net_id(signal_name), hidden=hidden
+        )
 
 
-def signal_add_polygon(msp, polygon, signal_name):
-    layer = layerdata[polygon["@layer"]]["@name"]
-    points = []
-    for point in polygon["vertex"]:
-        x = float(point["@x"])
-        y = float(point["@y"])
-        points.append((x, y))
+def signal_add_polygon(msp, polygon, vertices, signal_name):
+    layer = layerdata[polygon[0]]["@name"]
+    points = vertices.tolist()
 
     area_name = f"{layer}_{signal_name}"
     if area_name not in polygon_areas:
@@ -154,17 +298,20 @@ def signal_add_polygon(msp, polygon, signal_name):
 
     polygon_areas[area_name].append(points)
 
-    layer_org = layer
-
-    layer = f"{layer_org}Poly"
-    if layer not in polygons:
-        polygons[layer] = []
-
-    bigpoly = Polygon(points)
-    frame = Polygon(plain)
-
-    clipped_polygon = bigpoly.intersection(frame)
-    polygons[layer].append(clipped_polygon)
+    # computed after all copper is read
+    layer_store(layer)
+    _layer, _signal, width, isolate, thermals, rank, _start, _end = polygon
+    pours.append(
+        {
+            "layer": layer,
+            "net": net_id(signal_name),
+            "points": points,
+            "width": width,
+            "isolate": isolate,
+            "thermals": bool(thermals),
+            "rank": rank,
+        }
+    )
 
 
 def package_add_pad(
@@ -177,29 +324,17 @@ def package_add_pad(
     element_rot_angle,
     element_mirror,
 ):
-    layer = "Top"
-    if layer not in polygons:
-        polygons[layer] = []
-    layer = "Bottom"
-    if layer not in polygons:
-        polygons[layer] = []
+    layer_store("Top")
+    layer_store("Bottom")
 
-    shape = pad.get("@shape", "round")
+    px, py, drill, diameter, rot_angle, rot, shape, pad_name = pad
+    shape = strings[shape]
+    signal_name = pads2signals.get((element_name, strings[pad_name]), "")
+    pad_net = pad_net_id(signal_name, element_name, strings[pad_name])
 
     if shape not in ["long", "octagon", "round"]:
         print("Unsupported shape:", shape)
 
-    px = float(pad["@x"])
-    py = float(pad["@y"])
-
-    if "@rot" in pad:
-        rot = pad["@rot"]
-        # rot_dir = rot[0]
-        rot_angle = float(rot[1:])
-    else:
-        rot = ""
-        rot_angle = 0.0
-
     if element_mirror:
         if element_rot_angle in [90.0, 270.0]:
             py *= -1
@@ -224,36 +359,15 @@ def package_add_pad(
             y,
             element_rot_angle * math.pi / 180,
         )
-    drill = float(pad["@drill"])
-    msp.add_circle(
-        (x, y),
-        drill / 2,
-        dxfattribs={"layer": "Drills"},
-    )
+    drill_table.add(x, y, drill)
     layers_in_use.add("Drills")
     if shape in ["octagon", "round"]:
         # round and octagon shape
         for layer in ["Top", "Bottom"]:
-            signal_name = ""
-            for sname in signals2pads:
-                for spad in signals2pads[sname]:
-                    if (
-                        pad["@name"] == spad["@pad"]
-                        and element_name == spad["@element"]
-                    ):
-                        signal_name = sname
-                        break
             area_name = f"{layer}_{signal_name}"
-            if (
-                not fill_areas or area_name not in polygon_areas
-            ):  # TODO: check if inside
-                diameter = float(pad.get("@diameter", drill * 1.5))
-                if shape == "octagon":
-                    polygons[layer].append(
-                        Polygon(draw_circle((x, y), diameter / 2, 8))
-                    )
-                else:
-                    polygons[layer].append(Polygon(draw_circle((x, y), diameter / 2)))
+            hidden = fill_areas and area_name in polygon_areas  # TODO: check if inside
+            steps = 8 if shape == "octagon" else 18
+            polygons[layer].add_circle(x, y, diameter / 2, steps, pad_net, hidden)
     else:
         # long shape
 
@@ -281,21 +395,10 @@ def package_add_pad(
                 element_rot_angle * math.pi / 180,
             )
         for layer in ["Top", "Bottom"]:
-            signal_name = ""
-            for sname in signals2pads:
-                for spad in signals2pads[sname]:
-                    if (
-                        pad["@name"] == spad["@pad"]
-                        and element_name == spad["@element"]
-                    ):
-                        signal_name = sname
-                        break
             area_name = f"{layer}_{signal_name}"
-            if (
-                not fill_areas or area_name not in polygon_areas
-            ):  # TODO: check if inside
-                polygons[layer].append(Polygon(draw_circle((x1, y1), pad_size)))
-                polygons[layer].append(Polygon(draw_circle((x2, y2), pad_size)))
+            hidden = fill_areas and area_name in polygon_areas  # TODO: check if inside
+            polygons[layer].add_circle(x1, y1, pad_size, 18, pad_net, hidden)
+            polygons[layer].add_circle(x2, y2, pad_size, 18, pad_net, hidden)
         x1 = x + pad_size
         y1 = y - pad_size
         x2 = x - pad_size
@@ -341,29 +444,18 @@ def package_add_pad(
                 element_rot_angle * math.pi / 180,
             )
         for layer in ["Top", "Bottom"]:
-            signal_name = ""
-            for sname in signals2pads:
-                for spad in signals2pads[sname]:
-                    if (
-                        pad["@name"] == spad["@pad"]
-                        and element_name == spad["@element"]
-                    ):
-                        signal_name = sname
-                        break
             area_name = f"{layer}_{signal_name}"
-            if (
-                not fill_areas or area_name not in polygon_areas
-            ):  # TODO: check if inside
-                polygons[layer].append(
-                    Polygon(
-                        [
-                            (x1, y1),
-                            (x2, y2),
-                            (x4, y4),
-                            (x3, y3),
-                        ]
-                    )
-                )
+            hidden = fill_areas and area_name in polygon_areas  # TODO: check if inside
+            polygons[layer].add_poly(
+                [
+                    (x1, y1),
+                    (x2, y2),
+                    (x4, y4),
+                    (x3, y3),
+                ],
+                pad_net,
+                hidden,
+            )
 
 
 def package_add_circle(
@@ -376,10 +468,10 @@ def package_add_circle(
     element_rot_angle,
     element_mirror,
 ):
-    x = element_x + float(circle["@x"])
-    y = element_y + float(circle["@y"])
-    radius = float(circle["@radius"])
-    layer = layerdata[circle["@layer"]]["@name"]
+    cx, cy, radius, _width, layer_number = circle
+    x = element_x + cx
+    y = element_y + cy
+    layer = layerdata[layer_number]["@name"]
     if element_rot_angle:
         (x, y) = rotate_point(
             element_x,
@@ -402,12 +494,12 @@ def package_add_wire(
     element_rot_angle,
     element_mirror,
 ):
-    x1 = element_x + float(wire["@x1"])
-    x2 = element_x + float(wire["@x2"])
-    y1 = element_y + float(wire["@y1"])
-    y2 = element_y + float(wire["@y2"])
-    lw = float(wire["@width"])
-    layer = layerdata[wire["@layer"]]["@name"]
+    wx1, wy1, wx2, wy2, lw, layer_number = wire
+    x1 = element_x + wx1
+    x2 = element_x + wx2
+    y1 = element_y + wy1
+    y2 = element_y + wy2
+    layer = layerdata[layer_number]["@name"]
     if element_rot_angle:
         (x1, y1) = rotate_point(
             element_x,
@@ -444,11 +536,12 @@ def package_add_rectangle(
     element_rot_angle,
     element_mirror,
 ):
-    x1 = element_x + float(rectangle["@x1"])
-    x2 = element_x + float(rectangle["@x2"])
-    y1 = element_y + float(rectangle["@y1"])
-    y2 = element_y + float(rectangle["@y2"])
-    layer = layerdata[rectangle["@layer"]]["@name"]
+    rx1, ry1, rx2, ry2, layer_number = rectangle
+    x1 = element_x + rx1
+    x2 = element_x + rx2
+    y1 = element_y + ry1
+    y2 = element_y + ry2
+    layer = layerdata[layer_number]["@name"]
     if element_rot_angle:
         (x1, y1) = rotate_point(
             element_x,
@@ -487,9 +580,7 @@ def package_add_smd(
     element_rot_angle,
     element_mirror,
 ):
-
-    sx = float(smd["@x"])
-    sy = float(smd["@y"])
+    sx, sy, dx, dy, rot_angle, rot, smd_name, _layer = smd
     if element_mirror:
         if element_rot_angle in [90.0, 270.0]:
             sy *= -1
@@ -497,19 +588,10 @@ def package_add_smd(
             sx *= -1
     x = element_x + sx
     y = element_y + sy
-    dx = float(smd["@dx"])
-    dy = float(smd["@dy"])
     x1 = x - dx / 2
     y1 = y - dy / 2
     x2 = x + dx / 2
     y2 = y + dy / 2
-    if "@rot" in smd:
-        rot = smd["@rot"]
-        # rot_dir = rot[0]
-        rot_angle = float(rot[1:])
-    else:
-        rot = ""
-        rot_angle = 0.0
 
     if element_rot_angle:
         (x1, y1) = rotate_point(
@@ -545,41 +627,13 @@ def package_add_smd(
             rot_angle * math.pi / 180,
         )
 
-    signal_name = ""
-    for sname in signals2pads:
-        for spad in signals2pads[sname]:
-            if smd["@name"] == spad["@pad"] and element_name == spad["@element"]:
-                signal_name = sname
-                break
+    signal_name = pads2signals.get((element_name, strings[smd_name]), "")
+    pad_net = pad_net_id(signal_name, element_name, strings[smd_name])
     area_name = f"{layer}_{signal_name}"
-    if not fill_areas or area_name not in polygon_areas:  # TODO: check if inside
-        if layer not in polygons:
-            polygons[layer] = []
-
-        polygons[layer].append(
-            Polygon(
-                [
-                    (x1, y1),
-                    (x1, y2),
-                    (x2, y2),
-                    (x2, y1),
-                ]
-            )
-        )
+    hidden = fill_areas and area_name in polygon_areas  # TODO: check if inside
+    layer_store(layer).add_rect(x1, y1, x2, y2, pad_net, hidden)
 
-    p_layer = f"{layer}SMD"
-    if p_layer not in polygons:
-        polygons[p_layer] = []
-    polygons[p_layer].append(
-        Polygon(
-            [
-                (x1, y1),
-                (x1, y2),
-                (x2, y2),
-                (x2, y1),
-            ]
-        )
-    )
+    layer_store(f"{layer}SMD").add_rect(x1, y1, x2, y2, pad_net)
 
 
 def package_add_text(
@@ -592,11 +646,11 @@ def package_add_text(
     element_rot_angle,
     element_mirror,
 ):
-    x = element_x + float(text["@x"])
-    y = element_y + float(text["@y"])
-    size = float(text["@size"])
-    layer = layerdata[text["@layer"]]["@name"]
-    textstr = text["#text"]
+    tx, ty, size, layer_number, textstr = text
+    x = element_x + tx
+    y = element_y + ty
+    layer = layerdata[layer_number]["@name"]
+    textstr = strings[textstr]
     # TODO: mirror
     msp.add_text(textstr, height=size, dxfattribs={"layer": layer},).set_placement(
         (x, y),
@@ -605,7 +659,8 @@ def package_add_text(
 
 
 def main():
-    global fill_areas
+    global fill_areas, tile_size, jobs, chunk_size, grid_size, simplify_tolerance
+    global flat_union
 
     parser = argparse.ArgumentParser()
     parser.add_argument("filename", help="brd file", type=str, default=None)
@@ -616,9 +671,98 @@ def main():
     parser.add_argument("--list", help="list layers", action="store_true")
     parser.add_argument("--simple", help="simplifyed layers", action="store_true")
     parser.add_argument("--nofill", help="do not fill areas", action="store_true")
+    parser.add_argument(
+        "--pours",
+        help="copper pours: fill with clearance or the outline clipped to the board",
+        type=str,
+        default="fill",
+        choices=["fill", "outline"],
+    )
+    parser.add_argument(
+        "--cache", help="use/update compiled board cache", action="store_true"
+    )
+    parser.add_argument(
+        "--stats", help="report memory usage and timings", action="store_true"
+    )
+    parser.add_argument(
+        "--tile", help="union in tiles of this size (mm)", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--jobs", help="worker processes (default: all cpus)", type=int, default=0
+    )
+    parser.add_argument(
+        "--chunk",
+        help="union the primitives while reading, in chunks of this size",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--grid",
+        help="snap the copper to this precision grid (mm), e.g. 0.001",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--excellon", help="also write the drills as excellon file", type=str
+    )
+    parser.add_argument(
+        "--drc",
+        help="report copper of different nets closer than this clearance (mm)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--simplify",
+        help="simplify the outlines with this tolerance (mm), default 0.005",
+        type=float,
+        nargs="?",
+        const=0.005,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--stream",
+        help="write the dxf (R12) while converting, without an ezdxf document",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--panel",
+        help="panel of COLSxROWS copies of the board, e.g. 3x2",
+        type=panel_size,
+    )
+    parser.add_argument(
+        "--spacing",
+        help="space between the boards of a panel (mm)",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--nets",
+        help="write every net of the copper layers on its own layer "
+        "(Top_GND, ..) or with its name as xdata (appid BRD2DXF)",
+        choices=["layers", "xdata"],
+    )
+    parser.add_argument(
+        "--flat",
+        help="union each copper layer at once instead of net by net",
+        action="store_true",
+    )
     args = parser.parse_args()
+    started = time.perf_counter()
+    if args.drc and args.chunk:
+        parser.error("--drc needs all primitives, it can not be used with --chunk")
+    if args.nets and (args.chunk or args.tile or args.grid or args.stream):
+        parser.error("--nets can not be used with --chunk, --tile, --grid or --stream")
+    if args.nets and args.flat:
+        parser.error("--nets can not be used with --flat")
 
     fill_areas = not args.nofill
+    grid_size = args.grid
+    simplify_tolerance = args.simplify
+    chunk_size = args.chunk
+    tile_size = args.tile
+    flat_union = args.flat
+    jobs = args.jobs
+    report.enabled = args.stats
 
     if args.simple and args.list:
         for layer in selections:
@@ -628,17 +772,18 @@ def main():
     if not args.output:
         args.output = f"{args.filename}.dxf"
 
-    doc = ezdxf.new(setup=True)
-    msp = doc.modelspace()
-    doc.units = ezdxf.units.MM
+    if not args.stream:
+        doc = ezdxf.new(setup=True)
+        msp = doc.modelspace()
+        doc.units = ezdxf.units.MM
+        if args.nets == "xdata":
+            doc.appids.new("BRD2DXF")
 
     print(f"reading brd-file: {args.filename}")
-    xmldata = open(args.filename, "r").read()
-    xmldict = xmltodict.parse(xmldata)
-    layers = xmldict["eagle"]["drawing"]["layers"]
-    board = xmldict["eagle"]["drawing"]["board"]
+    board = read_board(args.filename, cache=args.cache)
+    strings.extend(board["strings"])
 
-    for layer in layers["layer"]:
+    for layer in board["layers"]:
         number = layer["@number"]
         # color = layer["@fill"]
         color = layer["@color"]
@@ -650,187 +795,148 @@ def main():
         # doc.layers.add(name=name, color=int(color))
 
     if args.list:
-        for layer in layers["layer"]:
+        for layer in board["layers"]:
             name = layer["@name"]
             print(name)
         exit(0)
 
-    for wire in board["plain"]["wire"]:
-        x1 = float(wire["@x1"])
-        x2 = float(wire["@x2"])
-        y1 = float(wire["@y1"])
-        y2 = float(wire["@y2"])
-        lw = float(wire["@width"])
-        layer = layerdata[wire["@layer"]]["@name"]
-        color = layerdata[wire["@layer"]]["@color"]
+    for x1, y1, x2, y2, _lw, layer_number in board["plain"].tolist():
+        plain.append((x1, y1))
+        plain.append((x2, y2))
+        if layerdata[layer_number]["@name"] == "Dimension":
+            outline.append((x1, y1))
+            outline.append((x2, y2))
+
+    poly_layers = {}
+    for number in board["polygons"]["layer"].tolist():
+        name = layerdata[number]["@name"]
+        poly_layers[name] = dxfcolors.get(name, int(layerdata[number]["@color"]))
+
+    offsets = [(0.0, 0.0)]
+    if args.panel:
+        if not outline:
+            parser.error("--panel needs the board outline (Dimension)")
+        cols, rows = args.panel
+        minx, miny, maxx, maxy = board_bounds()
+        step_x = maxx - minx + args.spacing
+        step_y = maxy - miny + args.spacing
+        offsets = panel_offsets(cols, rows, step_x, step_y)
+        print(f"panel: {cols}x{rows} copies, step {step_x:.2f}mm x {step_y:.2f}mm")
+
+    if args.stream:
+        print(f"streaming dxf-file: {args.output}")
+        msp = stream_writer(
+            args.output,
+            board["layers"],
+            poly_layers,
+            args.simple,
+            args.layer,
+            offsets,
+        )
+
+    for wire in board["plain"].tolist():
+        x1, y1, x2, y2, lw, layer_number = wire
+        layer = layerdata[layer_number]["@name"]
+        color = layerdata[layer_number]["@color"]
         msp.add_line(
             (x1, y1),
             (x2, y2),
             dxfattribs={"layer": layer, "lineweight": lw * 100},
         )
         layers_in_use.add(layer)
-        plain.append((x1, y1))
-        plain.append((x2, y2))
 
-    for signal in board["signals"]["signal"]:
-        signal_name = signal.get("@name", "")
-        if "contactref" in signal:
-            if isinstance(signal["contactref"], dict):
-                signal["contactref"] = [signal["contactref"]]
-            for contactref in signal["contactref"]:
-                if signal_name not in signals2pads:
-                    signals2pads[signal_name] = []
-                signals2pads[signal_name].append(contactref)
-
-        if "polygon" in signal:
-            if isinstance(signal["polygon"], dict):
-                signal["polygon"] = [signal["polygon"]]
-            for polygon in signal["polygon"]:
-                signal_add_polygon(msp, polygon, signal_name)
-
-        if "via" in signal:
-            if isinstance(signal["via"], dict):
-                signal["via"] = [signal["via"]]
-            for via in signal["via"]:
-                signal_add_via(msp, via, signal_name)
-
-        if "wire" in signal:
-            if isinstance(signal["wire"], dict):
-                signal["wire"] = [signal["wire"]]
-            for wire in signal["wire"]:
-                signal_add_wire(msp, wire, signal_name)
-
-    for element in board["elements"]["element"]:
-        element_name = element["@name"]
-        element_x = float(element["@x"])
-        element_y = float(element["@y"])
-        layer = "Top"
-        element_mirror = False
-        element_rot_angle = 0
-        if "@rot" in element:
-            rotate = element["@rot"]
-            if rotate[0] == "M":
-                layer = "Bottom"
-                element_mirror = True
-                element_rot_angle = float(rotate[2:])
-            else:
-                element_rot_angle = float(rotate[1:])
-
-        library_id = element["@library"]
-        package_name = element["@package"]
-        for library in board["libraries"]["library"]:
-            if library["@name"] == library_id:
-                if isinstance(library["packages"]["package"], dict):
-                    library["packages"]["package"] = [library["packages"]["package"]]
-                for package in library["packages"]["package"]:
-                    if package["@name"] == package_name:
-                        if "smd" in package:
-                            if isinstance(package["smd"], dict):
-                                package["smd"] = [package["smd"]]
-                            for smd in package["smd"]:
-                                package_add_smd(
-                                    msp,
-                                    smd,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-                        if "pad" in package:
-                            pads = package["pad"]
-                            if isinstance(pads, dict):
-                                pads = [pads]
-                            for pad in pads:
-                                package_add_pad(
-                                    msp,
-                                    pad,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-                        if "rectangle" in package:
-                            if isinstance(package["rectangle"], dict):
-                                package["rectangle"] = [package["rectangle"]]
-                            for rectangle in package["rectangle"]:
-                                package_add_rectangle(
-                                    msp,
-                                    rectangle,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-                        if "wire" in package:
-                            if isinstance(package["wire"], dict):
-                                package["wire"] = [package["wire"]]
-                            for wire in package["wire"]:
-                                package_add_wire(
-                                    msp,
-                                    wire,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-                        if "circle" in package:
-                            if isinstance(package["circle"], dict):
-                                package["circle"] = [package["circle"]]
-                            for circle in package["circle"]:
-                                package_add_circle(
-                                    msp,
-                                    circle,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-                        if "text" in package:
-                            if isinstance(package["text"], dict):
-                                package["text"] = [package["text"]]
-                            for text in package["text"]:
-                                package_add_text(
-                                    msp,
-                                    text,
-                                    layer,
-                                    element_name,
-                                    element_x,
-                                    element_y,
-                                    element_rot_angle,
-                                    element_mirror,
-                                )
-
-    polygons_off = {}
-    for polylayer in ["Top", "Bottom"]:
-        if polylayer not in polygons_off:
-            polygons_off[polylayer] = []
-        for poly in polygons[polylayer]:
-            polygons_off[polylayer].append(poly.buffer(0.1))
+    for signal_name, element_name, pad_name in board["contacts"].tolist():
+        pads2signals[(strings[element_name], strings[pad_name])] = strings[signal_name]
+
+    for polygon in board["polygons"].tolist():
+        start, end = polygon[-2:]
+        signal_add_polygon(
+            msp, polygon, board["vertices"][start:end], strings[polygon[1]]
+        )
+
+    for via in board["vias"].tolist():
+        signal_add_via(msp, via, strings[via[-1]])
+
+    for wire in board["wires"].tolist():
+        signal_add_wire(msp, wire, strings[wire[-1]])
+
+    packages = board["packages"].tolist()
+    for element in board["elements"].tolist():
+        element_x, element_y, element_rot_angle, element_mirror, name, package = element
+        if package < 0:
+            continue
+        element_name = strings[name]
+        element_mirror = bool(element_mirror)
+        layer = "Bottom" if element_mirror else "Top"
+        package = packages[package]
+        for (kind, add_func), start, end in zip(
+            [
+                ("smds", package_add_smd),
+                ("pads", package_add_pad),
+                ("rectangles", package_add_rectangle),
+                ("package_wires", package_add_wire),
+                ("circles", package_add_circle),
+                ("texts", package_add_text),
+            ],
+            package[2::2],
+            package[3::2],
+        ):
+            for item in board[kind][start:end].tolist():
+                add_func(
+                    msp,
+                    item,
+                    layer,
+                    element_name,
+                    element_x,
+                    element_y,
+                    element_rot_angle,
+                    element_mirror,
+                )
+
+    if args.drc:
+        names = list(nets)
+        violations = []
+        for polylayer in ["Top", "Bottom"]:
+            store = polygons[polylayer]
+            geoms, owners = store.geometries()
+            with report.Timer() as timer:
+                violations += check_layer(
+                    polylayer, geoms, store.net_ids(owners), names, args.drc
+                )
+            report.stats(
+                f"{polylayer}: clearance check of {len(geoms)} polygons "
+                f"in {timer.seconds:.2f}s"
+            )
+        for violation in violations:
+            position = (violation["x"], violation["y"])
+            msp.add_circle(position, args.drc, dxfattribs={"layer": "DRC"})
+            msp.add_line(
+                (position[0] - args.drc, position[1]),
+                (position[0] + args.drc, position[1]),
+                dxfattribs={"layer": "DRC"},
+            )
+            msp.add_line(
+                (position[0], position[1] - args.drc),
+                (position[0], position[1] + args.drc),
+                dxfattribs={"layer": "DRC"},
+            )
+        write_report(
+            f"{os.path.splitext(args.output)[0]}.drc.json", args.drc, violations
+        )
+
+    for polylayer, store in polygons.items():
+        report.stats(
+            f"{polylayer}: {len(store)} primitives in {store.nbytes() / 1024:.1f}kB"
+        )
+    report.stats("before union")
 
     # merge polygons per layer (signal mask)
-    for polylayer in polygons_off:
-        u = unary_union(polygons_off[polylayer])
-        if not isinstance(u, shapely.geometry.multipolygon.MultiPolygon):
-            u = [u]
-        else:
-            u = u.geoms
-        for poly in u:
-            points = list(poly.exterior.coords)
+    for polylayer in ["Top", "Bottom"]:
+        with report.Timer() as timer:
+            u = merge(polygons[polylayer], 0.1)
+        report.stats(f"{polylayer}_inner: union in {timer.seconds:.2f}s")
+        u = simplify(u, f"{polylayer}_inner")
+        for points in outline_rings(u):
             last = points[-1]
             for p in points:
                 msp.add_line(
@@ -842,27 +948,100 @@ def main():
                 last = p
 
     # merge polygons per layer (single signals)
+    # unconnected pads stay on the copper layer, without a net name
+    names = ["" if net in pad_nets else name for net, name in enumerate(nets)]
     for polylayer in polygons:
-        u = unary_union(polygons[polylayer])
-        if not isinstance(u, shapely.geometry.multipolygon.MultiPolygon):
-            u = [u]
+        per_net = {} if args.nets and polylayer in ["Top", "Bottom"] else None
+        with report.Timer() as timer:
+            u = merge(polygons[polylayer], per_net=per_net)
+        report.stats(f"{polylayer}: union in {timer.seconds:.2f}s")
+        if per_net and args.nets == "layers":
+            # the outlines of every net instead of the combined layer
+            u = shapely.GeometryCollection(list(per_net.values()))
+            u = simplify(u, polylayer)
+            outlines = zip([[names[net]] for net in per_net], u.geoms)
+        elif per_net:
+            # the combined layer, every part tagged with the nets in it
+            u = simplify(u, polylayer)
+            outlines = [
+                ([names[net] for net in part_net], part)
+                for part, part_net in part_nets(u, per_net)
+            ]
         else:
-            u = u.geoms
-        for poly in u:
-            points = list(poly.exterior.coords)
-            if not points:
-                continue
+            outlines = [([], simplify(u, polylayer))]
+        for net_names, geom in outlines:
+            layer = polylayer
+            if args.nets == "layers" and net_names:
+                layer = net_layer(polylayer, net_names[0])
+            xdata = [(1000, net_name) for net_name in net_names if net_name]
+            for points in outline_rings(geom):
+                last = points[-1]
+                for p in points:
+                    line = msp.add_line(
+                        last,
+                        p,
+                        dxfattribs={"layer": layer},
+                    )
+                    if args.nets == "xdata" and xdata:
+                        line.set_xdata("BRD2DXF", xdata)
+                    layers_in_use.add(polylayer)
+                    last = p
+    report.stats("after union")
+
+    # copper pours
+    if pours and (chunk_size or args.pours == "outline"):
+        if chunk_size and args.pours == "fill":
+            print("pours: --chunk keeps no primitives, using the clipped outlines")
+        fills = {}
+        for pour in pours:
+            fill = Polygon(pour["points"]).intersection(Polygon(plain))
+            fills[pour["layer"]] = fill.union(fills.get(pour["layer"], Polygon()))
+    else:
+        with report.Timer() as timer:
+            fills = compute_pours(pours, polygons, Polygon(plain), jobs)
+        report.stats(f"{len(pours)} pours in {timer.seconds:.2f}s")
+    for polylayer, fill in fills.items():
+        fill = simplify(fill, f"{polylayer}Poly", holes=True)
+        for points in outline_rings(fill, holes=True):
             last = points[-1]
             for p in points:
                 msp.add_line(
                     last,
                     p,
-                    dxfattribs={"layer": polylayer},
+                    dxfattribs={"layer": f"{polylayer}Poly"},
                 )
-                layers_in_use.add(polylayer)
                 last = p
 
-    for layer in layers["layer"]:
+    # drills sorted by tool and drill order
+    tools, (travel_before, travel_after) = drill_table.optimize()
+    print(
+        f"drills: {len(drill_table)} holes, "
+        f"{sum(len(points) for _diameter, points in tools)} unique, "
+        f"{len(tools)} tools, travel {travel_before:.1f}mm -> {travel_after:.1f}mm"
+    )
+    for diameter, points in tools:
+        for x, y in points:
+            msp.add_circle((x, y), diameter / 2, dxfattribs={"layer": "Drills"})
+    if args.excellon:
+        print(f"writing excellon-file: {args.excellon}")
+        if len(offsets) > 1:
+            # every tool drills the copies in panel order
+            tools = [
+                (
+                    diameter,
+                    [(x + dx, y + dy) for dx, dy in offsets for x, y in points],
+                )
+                for diameter, points in tools
+            ]
+        write_excellon(args.excellon, tools)
+
+    if args.stream:
+        msp.close()
+        print(f"dxf-file written: {msp.entities} entities")
+        report.stats(f"total {time.perf_counter() - started:.2f}s")
+        return
+
+    for layer in board["layers"]:
         number = layer["@number"]
         # color = layer["@fill"]
         color = layer["@color"]
@@ -875,48 +1054,83 @@ def main():
 
     doc.layers.add(name="TopPoly", color=1)
     doc.layers.add(name="BottomPoly", color=5)
+    for name, color in poly_layers.items():
+        if f"{name}Poly" not in doc.layers:
+            doc.layers.add(name=f"{name}Poly", color=color)
 
     doc.layers.add(name="TopSMD", color=1)
     doc.layers.add(name="BottomSMD", color=5)
 
+    for name, layer in net_layers.items():
+        doc.layers.add(name=name, color=dxfcolors[layer])
+
+    if args.drc:
+        doc.layers.add(name="DRC", color=6)
+
     if args.simple:
         # combine layers
         for select in selections:
             doc.layers.add(name=select, color=selections[select]["color"])
-        for entity in list(doc.entitydb.values()):
-            if not entity.dxf.hasattr("layer"):
-                continue
+        for entity in list(msp):
             found = False
+            layer = net_layers.get(entity.dxf.layer, entity.dxf.layer)
             for select in selections:
-                if entity.dxf.layer in selections[select]["layers"]:
+                if layer in selections[select]["layers"]:
                     entity.dxf.layer = select
                     found = True
             if not found:
-                entity.destroy()
+                msp.delete_entity(entity)
 
         # removing unused layers
         for layer in layers_in_use:
-            if layer not in selections:
+            if layer not in selections and layer in doc.layers:
                 doc.layers.remove(layer)
 
     # clean by selection
     if args.layer:
         # removing entity from unused layers
-        for entity in doc.entitydb.values():
-            if not entity.dxf.hasattr("layer"):
-                continue
-
-            if entity.dxf.layer not in args.layer:
-                entity.destroy()
+        # net layers are selected with their copper layer
+        for entity in list(msp):
+            layer = net_layers.get(entity.dxf.layer, entity.dxf.layer)
+            if entity.dxf.layer not in args.layer and layer not in args.layer:
+                msp.delete_entity(entity)
 
         # removing unused layers
         for layer in layers_in_use:
-            if layer not in args.layer:
+            if layer not in args.layer and layer in doc.layers:
                 doc.layers.remove(layer)
+        for name, layer in net_layers.items():
+            if name not in args.layer and layer not in args.layer:
+                doc.layers.remove(name)
+
+    if len(offsets) > 1:
+        # the converted board becomes a block, the panel inserts it
+        block = doc.blocks.new(name="BOARD")
+        for entity in list(msp):
+            msp.move_to_layout(entity, block)
+        for offset in offsets:
+            msp.add_blockref("BOARD", offset)
+
+    with report.Timer() as timer:
+        for vport in doc.viewports.get_config("*Active"):  # type: ignore
+            vport.dxf.grid_on = True
+        if len(offsets) > 1:
+            # extents of one copy, the inserts are not exploded
+            extents = bbox.extents(block)
+            zoom.window(
+                msp,
+                (extents.extmin.x, extents.extmin.y),
+                (
+                    extents.extmax.x + max(x for x, _y in offsets),
+                    extents.extmax.y + max(y for _x, y in offsets),
+                ),
+            )
+        else:
+            zoom.extents(msp)  # type: ignore
 
-    for vport in doc.viewports.get_config("*Active"):  # type: ignore
-        vport.dxf.grid_on = True
-    zoom.extents(msp)  # type: ignore
-
-    print(f"writing dxf-file: {args.output}")
-    doc.saveas(args.output)
+        print(f"writing dxf-file: {args.output}")
+        doc.saveas(args.output)
+    report.stats(
+        f"dxf written in {timer.seconds:.2f}s, "
+        f"total {time.perf_counter() - started:.2f}s"
+    )
@@ -0,0 +1,227 @@
+"""geometric comparison of two dxf files, layer by layer."""
+
+import argparse
+import sys
+from collections import Counter
+
+import ezdxf
+import numpy
+import shapely
+
+
+def _entities(layout):
+    """entities of a layout, block references are exploded"""
+    for entity in layout:
+        if entity.dxftype() == "INSERT":
+            yield from _entities(entity.virtual_entities())
+        else:
+            yield entity
+
+
+def load_dxf(filename):
+    """reads the line work and circles of a dxf
+
+    returns {layer: {"counts": Counter, "segments": [(x1, y1, x2, y2), ..],
+    "circles": [(x, y, radius), ..]}}
+    """
+    doc = ezdxf.readfile(filename)
+    layers = {}
+    for entity in _entities(doc.modelspace()):
+        data = layers.setdefault(
+            entity.dxf.layer, {"counts": Counter(), "segments": [], "circles": []}
+        )
+        kind = entity.dxftype()
+        data["counts"][kind] += 1
+        if kind == "LINE":
+            start, end = entity.dxf.start, entity.dxf.end
+            data["segments"].append((start.x, start.y, end.x, end.y))
+        elif kind in ("LWPOLYLINE", "POLYLINE"):
+            if kind == "LWPOLYLINE":
+                points = [(x, y) for x, y, *_rest in entity.get_points()]
+            else:
+                points = [(point.x, point.y) for point in entity.points()]
+            if entity.is_closed and points:
+                points.append(points[0])
+            for p_1, p_2 in zip(points, points[1:]):
+                data["segments"].append((*p_1, *p_2))
+        elif kind == "CIRCLE":
+            center = entity.dxf.center
+            data["circles"].append((center.x, center.y, entity.dxf.radius))
+    return layers
+
+
+def region(segments):
+    """area enclosed by the line segments (even-odd rule)
+
+    the line work is noded and polygonized into faces, a face is inside if
+    a ray from one of its points crosses the segments an odd number of times.
+    this works for touching outlines and holes, whatever the ring order.
+    """
+    segments = numpy.asarray(segments, dtype=float).reshape(-1, 4)
+    segments = segments[
+        (segments[:, 0] != segments[:, 2]) | (segments[:, 1] != segments[:, 3])
+    ]
+    if len(segments) == 0:
+        return shapely.Polygon()
+    lines = shapely.linestrings(segments.reshape(-1, 2, 2))
+    noded = shapely.get_parts(shapely.union_all(lines))
+    faces = shapely.get_parts(shapely.polygonize(noded))
+    if len(faces) == 0:
+        return shapely.Polygon()
+    points = shapely.get_coordinates(shapely.point_on_surface(faces))
+    rays = shapely.linestrings(
+        numpy.stack(
+            [
+                points,
+                numpy.stack(
+                    [
+                        numpy.full(len(points), segments[:, [0, 2]].max() + 1.0),
+                        points[:, 1],
+                    ],
+                    axis=-1,
+                ),
+            ],
+            axis=1,
+        )
+    )
+    ray, hit = shapely.STRtree(lines).query(rays)
+    x1, y1, x2, y2 = segments[hit].T
+    y = points[ray, 1]
+    crossing = (y1 > y) != (y2 > y)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossing &= x > points[ray, 0]
+    inside = numpy.bincount(ray[crossing], minlength=len(faces)) % 2 == 1
+    return shapely.union_all(faces[inside])
+
+
+def match_holes(first, second, tolerance):
+    """number of circles of first without a circle of second at the same
+    position and with the same radius (within tolerance)"""
+    if not first:
+        return 0
+    if not second:
+        return len(first)
+    first = numpy.asarray(first)
+    second = numpy.asarray(second)
+    tree = shapely.STRtree(shapely.points(second[:, :2]))
+    found, other = tree.query(
+        shapely.points(first[:, :2]), predicate="dwithin", distance=tolerance
+    )
+    same = numpy.abs(first[found, 2] - second[other, 2]) <= tolerance
+    return len(first) - len(numpy.unique(found[same]))
+
+
+def compare(
+    first,
+    second,
+    area_tolerance=0.01,
+    relative_tolerance=0.001,
+    hole_tolerance=0.01,
+    count_tolerance=0.05,
+    ignore=(),
+):
+    """compares two load_dxf() results, returns a list of per layer results
+
+    a layer matches if the symmetric difference of the regions is below
+    area_tolerance (mm²) or relative_tolerance of the region area, every
+    circle has a partner within hole_tolerance and the entity counts per
+    type differ by at most count_tolerance (relative).
+    """
+    results = []
+    for layer in sorted(set(first) | set(second)):
+        if layer in ignore:
+            continue
+        empty = {"counts": Counter(), "segments": [], "circles": []}
+        data_a = first.get(layer, empty)
+        data_b = second.get(layer, empty)
+        region_a = region(data_a["segments"])
+        region_b = region(data_b["segments"])
+        difference = shapely.symmetric_difference(region_a, region_b).area
+        holes = match_holes(
+            data_a["circles"], data_b["circles"], hole_tolerance
+        ) + match_holes(data_b["circles"], data_a["circles"], hole_tolerance)
+        counts = []
+        for kind in sorted(set(data_a["counts"]) | set(data_b["counts"])):
+            count_a = data_a["counts"][kind]
+            count_b = data_b["counts"][kind]
+            if abs(count_a - count_b) > count_tolerance * max(count_a, count_b):
+                counts.append(f"{kind} {count_a} != {count_b}")
+        area = max(region_a.area, region_b.area)
+        area_ok = difference <= max(area_tolerance, relative_tolerance * area)
+        results.append(
+            {
+                "layer": layer,
+                "area": (round(region_a.area, 4), round(region_b.area, 4)),
+                "difference": difference,
+                "holes": (len(data_a["circles"]), len(data_b["circles"])),
+                "unmatched": holes,
+                "counts": counts,
+                "ok": area_ok and holes == 0 and not counts,
+            }
+        )
+    return results
+
+
+def print_results(results):
+    for result in results:
+        problems = list(result["counts"])
+        if result["unmatched"]:
+            problems.append(f"{result['unmatched']} unmatched holes")
+        print(
+            f"  {'ok  ' if result['ok'] else 'FAIL'} {result['layer']}: "
+            f"area {result['area'][0]} / {result['area'][1]}, "
+            f"difference {result['difference']:.6f}, "
+            f"holes {result['holes'][0]} / {result['holes'][1]}"
+            + (f" ({', '.join(problems)})" if problems else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compares the copper regions, holes and entities of two dxf"
+    )
+    parser.add_argument("first", help="reference dxf file", type=str)
+    parser.add_argument("second", help="dxf file to check", type=str)
+    parser.add_argument(
+        "--area", help="allowed difference area (mm²)", type=float, default=0.01
+    )
+    parser.add_argument(
+        "--relative",
+        help="allowed difference relative to the layer area",
+        type=float,
+        default=0.001,
+    )
+    parser.add_argument(
+        "--holes", help="allowed hole position offset (mm)", type=float, default=0.01
+    )
+    parser.add_argument(
+        "--counts",
+        help="allowed relative difference of the entity counts",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "--ignore", help="skip this layer", type=str, default=[], action="append"
+    )
+    args = parser.parse_args()
+
+    results = compare(
+        load_dxf(args.first),
+        load_dxf(args.second),
+        args.area,
+        args.relative,
+        args.holes,
+        args.counts,
+        args.ignore,
+    )
+    print_results(results)
+    failed = [result["layer"] for result in results if not result["ok"]]
+    if failed:
+        print(f"{len(failed)} of {len(results)} layers differ")
+        sys.exit(1)
+    print(f"all {len(results)} layers match")
+
+
+if __name__ == "__main__":
+    main()
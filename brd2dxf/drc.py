@@ -0,0 +1,77 @@
+"""clearance check between the copper of different nets."""
+
+import json
+
+import numpy
+import shapely
+
+
+def clearance_violations(geoms, nets, clearance):
+    """finds all polygon pairs of different nets closer than clearance
+
+    returns (first, second, distance, location) arrays, first and second are
+    indices into geoms, location is the middle of the shortest connection.
+    """
+    tree = shapely.STRtree(geoms)
+    # bounding box candidates first, exact distances only for different nets
+    boxes = shapely.bounds(geoms)
+    boxes[:, :2] -= clearance
+    boxes[:, 2:] += clearance
+    first, second = tree.query(shapely.box(*boxes.T))
+    pair = (first < second) & (nets[first] != nets[second])
+    first = first[pair]
+    second = second[pair]
+    distance = shapely.distance(geoms[first], geoms[second])
+    close = distance < clearance
+    first = first[close]
+    second = second[close]
+    distance = distance[close]
+    lines = shapely.shortest_line(geoms[first], geoms[second])
+    location = shapely.get_coordinates(
+        shapely.line_interpolate_point(lines, 0.5, normalized=True)
+    )
+    return (first, second, distance, location)
+
+
+def check_layer(layer, geoms, nets, names, clearance):
+    """violations of one layer, the closest one per net pair and location cell"""
+    first, second, distance, location = clearance_violations(geoms, nets, clearance)
+    net_a = numpy.minimum(nets[first], nets[second])
+    net_b = numpy.maximum(nets[first], nets[second])
+    cells = numpy.round(location / clearance).astype(numpy.int64)
+    keys = numpy.stack([net_a, net_b, cells[:, 0], cells[:, 1]], axis=-1)
+    order = numpy.argsort(distance, kind="stable")
+    _keys, unique = numpy.unique(keys[order], axis=0, return_index=True)
+    violations = []
+    for num in order[unique].tolist():
+        violations.append(
+            {
+                "layer": layer,
+                "nets": sorted((names[net_a[num]], names[net_b[num]])),
+                "distance": round(float(distance[num]), 4),
+                "x": round(float(location[num][0]), 4),
+                "y": round(float(location[num][1]), 4),
+            }
+        )
+    return sorted(
+        violations, key=lambda violation: (violation["nets"], violation["distance"])
+    )
+
+
+def write_report(filename, clearance, violations):
+    """prints the violations and writes them as json"""
+    for violation in violations:
+        print(
+            f"  {violation['layer']}: {violation['nets'][0]} <-> "
+            f"{violation['nets'][1]}: {violation['distance']:.3f}mm "
+            f"at ({violation['x']:.3f}, {violation['y']:.3f})"
+        )
+    pairs = {(violation["layer"], *violation["nets"]) for violation in violations}
+    print(
+        f"drc: {len(violations)} clearance violations < {clearance}mm "
+        f"between {len(pairs)} net pairs"
+    )
+    with open(filename, "w") as report_file:
+        json.dump(
+            {"clearance": clearance, "violations": violations}, report_file, indent=2
+        )
@@ -0,0 +1,264 @@
+"""drill table: hole deduplication, tool grouping and drill ordering."""
+
+import heapq
+import math
+from array import array
+
+import numpy
+import shapely
+
+
+class Grid:
+    """hash grid over points for near neighbour searches
+
+    a search that walked max_rings rings of cells without finding enough
+    points scans the remaining points instead, removed points free their
+    cells so the scan only visits occupied ones.
+    """
+
+    def __init__(self, points, cell, max_rings=64):
+        self.points = points
+        self.cell = cell
+        self.max_rings = max_rings
+        self.cells = {}
+        for num, (x, y) in enumerate(points):
+            self.cells.setdefault(self.key(x, y), []).append(num)
+        keys = list(self.cells) or [(0, 0)]
+        self.low = (min(key[0] for key in keys), min(key[1] for key in keys))
+        self.high = (max(key[0] for key in keys), max(key[1] for key in keys))
+
+    def key(self, x, y):
+        return (math.floor(x / self.cell), math.floor(y / self.cell))
+
+    def ring(self, x, y, radius):
+        """point indices of the cells in the ring at radius around (x, y)"""
+        cx, cy = self.key(x, y)
+        if radius == 0:
+            yield from self.cells.get((cx, cy), ())
+            return
+        for gx in range(cx - radius, cx + radius + 1):
+            yield from self.cells.get((gx, cy - radius), ())
+            yield from self.cells.get((gx, cy + radius), ())
+        for gy in range(cy - radius + 1, cy + radius):
+            yield from self.cells.get((cx - radius, gy), ())
+            yield from self.cells.get((cx + radius, gy), ())
+
+    def remove(self, num):
+        x, y = self.points[num]
+        key = self.key(x, y)
+        self.cells[key].remove(num)
+        if not self.cells[key]:
+            del self.cells[key]
+
+    def nearest(self, x, y, count=1):
+        """the count nearest point indices, nearest first"""
+        found = []
+        radius = 0
+        cx, cy = self.key(x, y)
+        max_radius = max(
+            abs(cx - self.low[0]),
+            abs(cx - self.high[0]),
+            abs(cy - self.low[1]),
+            abs(cy - self.high[1]),
+        )
+        while radius <= max_radius:
+            if radius > self.max_rings:
+                found = heapq.nsmallest(
+                    count,
+                    (
+                        (
+                            math.hypot(
+                                self.points[num][0] - x, self.points[num][1] - y
+                            ),
+                            num,
+                        )
+                        for cell in self.cells.values()
+                        for num in cell
+                    ),
+                )
+                break
+            for num in self.ring(x, y, radius):
+                px, py = self.points[num]
+                found.append((math.hypot(px - x, py - y), num))
+            # everything outside the rings is at least radius * cell away
+            if len(found) >= count:
+                found.sort()
+                if found[count - 1][0] <= radius * self.cell:
+                    break
+            radius += 1
+        found.sort()
+        return [num for _dist, num in found[:count]]
+
+
+def cell_size(points):
+    """grid cell holding about two holes where they are dense
+
+    the median distance to the nearest other hole follows the local
+    density, clusters (panels, connectors) don't end up in a few cells.
+    """
+    geoms = shapely.points(numpy.asarray(points, dtype=float))
+    _index, distance = shapely.STRtree(geoms).query_nearest(
+        geoms, exclusive=True, return_distance=True
+    )
+    return max(2 * float(numpy.median(distance)), 1e-3) if len(distance) else 1.0
+
+
+def travel(points, order, start=(0.0, 0.0)):
+    """length of the path from start through the points in order"""
+    length = 0.0
+    last = start
+    for num in order:
+        length += math.hypot(points[num][0] - last[0], points[num][1] - last[1])
+        last = points[num]
+    return length
+
+
+def nearest_neighbour_tour(points, start=(0.0, 0.0)):
+    """greedy tour, always drilling the nearest hole next"""
+    if len(points) < 3:
+        return sorted(
+            range(len(points)),
+            key=lambda num: math.hypot(
+                points[num][0] - start[0], points[num][1] - start[1]
+            ),
+        )
+    grid = Grid(points, cell_size(points))
+    order = []
+    x, y = start
+    for _num in range(len(points)):
+        nearest = grid.nearest(x, y)[0]
+        grid.remove(nearest)
+        order.append(nearest)
+        x, y = points[nearest]
+    return order
+
+
+def two_opt(points, order, start=(0.0, 0.0), neighbours=8, passes=10, max_reverse=1000):
+    """improves an open tour with 2-opt moves between near neighbours
+
+    a move reverses at most max_reverse holes, a pass stays O(n).
+    """
+    count = len(order)
+    if count < 3:
+        return order
+    grid = Grid(points, cell_size(points))
+    near = [grid.nearest(x, y, neighbours + 1)[1:] for x, y in points]
+    # position 0 is the fixed start point
+    path = [None] + list(order)
+    pos = [0] * len(points)
+    for num, point in enumerate(path[1:], 1):
+        pos[point] = num
+
+    def coord(num):
+        return start if path[num] is None else points[path[num]]
+
+    def dist(p_1, p_2):
+        return math.hypot(p_1[0] - p_2[0], p_1[1] - p_2[1])
+
+    for _pass in range(passes):
+        improved = False
+        for i in range(count):
+            a, b = coord(i), coord(i + 1)
+            candidates = near[path[i]] if path[i] is not None else []
+            for c_point in candidates:
+                j = pos[c_point]
+                if j <= i + 1 or j - i > max_reverse:
+                    continue
+                c = points[c_point]
+                # reverse path[i + 1 : j + 1], the edge after j may not exist
+                gain = dist(a, b) - dist(a, c)
+                if j < count:
+                    d = coord(j + 1)
+                    gain += dist(c, d) - dist(b, d)
+                if gain > 1e-9:
+                    path[i + 1 : j + 1] = path[i + 1 : j + 1][::-1]
+                    for num in range(i + 1, j + 1):
+                        pos[path[num]] = num
+                    improved = True
+                    a, b = coord(i), coord(i + 1)
+        if not improved:
+            break
+    return path[1:]
+
+
+class DrillTable:
+    """collects the holes of vias and pads"""
+
+    def __init__(self):
+        self.holes = array("d")
+
+    def __len__(self):
+        return len(self.holes) // 3
+
+    def add(self, x, y, diameter):
+        self.holes.extend((x, y, diameter))
+
+    def unique(self, tolerance=0.01):
+        """removes coincident holes (keeps the biggest diameter)"""
+        holes = []
+        grid = {}
+        for num in range(len(self)):
+            x, y, diameter = self.holes[num * 3 : num * 3 + 3]
+            gx, gy = round(x / tolerance), round(y / tolerance)
+            duplicate = None
+            for key in ((gx + dx, gy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)):
+                for other in grid.get(key, ()):
+                    ox, oy, _od = holes[other]
+                    if math.hypot(ox - x, oy - y) <= tolerance:
+                        duplicate = other
+                        break
+                if duplicate is not None:
+                    break
+            if duplicate is None:
+                grid.setdefault((gx, gy), []).append(len(holes))
+                holes.append([x, y, diameter])
+            else:
+                holes[duplicate][2] = max(holes[duplicate][2], diameter)
+        return holes
+
+    def optimize(self, tolerance=0.01, start=(0.0, 0.0)):
+        """returns the tools [(diameter, [(x, y), ..]), ..] in drill order
+
+        and the travel (before, after): before is the file order per tool
+        with duplicates, after the deduplicated nearest neighbour + 2-opt tour.
+        """
+        before = 0.0
+        last = start
+        file_tools = {}
+        for num in range(len(self)):
+            x, y, diameter = self.holes[num * 3 : num * 3 + 3]
+            file_tools.setdefault(round(diameter, 3), []).append((x, y))
+        for diameter in sorted(file_tools):
+            points = file_tools[diameter]
+            before += travel(points, range(len(points)), last)
+            last = points[-1]
+
+        tools = {}
+        for x, y, diameter in self.unique(tolerance):
+            tools.setdefault(round(diameter, 3), []).append((x, y))
+        after = 0.0
+        last = start
+        result = []
+        for diameter in sorted(tools):
+            points = tools[diameter]
+            order = nearest_neighbour_tour(points, last)
+            order = two_opt(points, order, last)
+            after += travel(points, order, last)
+            points = [points[num] for num in order]
+            last = points[-1]
+            result.append((diameter, points))
+        return result, (before, after)
+
+
+def write_excellon(filename, tools):
+    """writes the tools as excellon drill file (metric, decimal point)"""
+    with open(filename, "w") as excellon:
+        excellon.write("M48\nMETRIC,TZ\n")
+        for num, (diameter, _points) in enumerate(tools, 1):
+            excellon.write(f"T{num:02d}C{diameter:.3f}\n")
+        excellon.write("%\nG90\nG05\n")
+        for num, (_diameter, points) in enumerate(tools, 1):
+            excellon.write(f"T{num:02d}\n")
+            for x, y in points:
+                excellon.write(f"X{x:.3f}Y{y:.3f}\n")
+        excellon.write("T00\nM30\n")
@@ -0,0 +1,245 @@
+"""streaming dxf writer, the entities go to the file when they are added."""
+
+import math
+
+# fixed width of the patched header values
+_WIDTH = 24
+
+
+class _Text:
+    """pending text, written by set_placement() like ezdxf's add_text()"""
+
+    def __init__(self, stream, text, height, layer, color):
+        self.stream = stream
+        self.text = text
+        self.height = height
+        self.layer = layer
+        self.color = color
+
+    def set_placement(self, point):
+        if self.layer is None:
+            return self
+        self.stream._extend(point)
+        self.stream._entity("TEXT", self.layer, self.color)
+        self.stream._point(10, point)
+        self.stream._tag(40, self.height)
+        self.stream._tag(1, self.text)
+        return self
+
+
+class DxfStream:
+    """writes a dxf (R12) without keeping the drawing in memory
+
+    the methods follow the ezdxf modelspace ones used by the converter
+    (add_line, add_circle, add_lwpolyline, add_polyline2d, add_text).
+    layers maps the layer names to their color, the layer table is written
+    first, so all layers must be known in advance. rename maps the layer of
+    an entity to its output layer (--simple), entities of layers missing in
+    rename are dropped. the extents are tracked while writing and patched
+    into the header and the active viewport by close(). with offsets
+    (panels) the entities go into the block BOARD, close() inserts it at
+    every offset.
+    """
+
+    def __init__(self, filename, layers, rename=None, offsets=None):
+        self.file = open(filename, "w", encoding="cp1252", errors="replace")
+        self.rename = rename if rename is not None else {name: name for name in layers}
+        self.extmin = [math.inf, math.inf]
+        self.extmax = [-math.inf, -math.inf]
+        self.entities = 0
+        self.offsets = offsets
+        self.placeholders = {}
+        self._section("HEADER")
+        self._tag(9, "$ACADVER")
+        self._tag(1, "AC1009")
+        self._tag(9, "$INSUNITS")
+        self._tag(70, 4)
+        self._tag(9, "$EXTMIN")
+        self._placeholder("extmin", (10, 20, 30))
+        self._tag(9, "$EXTMAX")
+        self._placeholder("extmax", (10, 20, 30))
+        self._endsec()
+
+        self._section("TABLES")
+        self._table("VPORT", 1)
+        self._tag(0, "VPORT")
+        self._tag(2, "*ACTIVE")
+        self._tag(70, 0)
+        self._point(10, (0.0, 0.0), z=False)
+        self._point(11, (1.0, 1.0), z=False)
+        self._placeholder("center", (12, 22))
+        self._point(13, (0.0, 0.0), z=False)
+        self._point(14, (1.0, 1.0), z=False)
+        self._point(15, (1.0, 1.0), z=False)
+        self._point(16, (0.0, 0.0))
+        self._tag(36, 1.0)
+        self._point(17, (0.0, 0.0))
+        self._placeholder("height", (40,))
+        for code, value in ((41, 1.0), (42, 50.0), (43, 0.0), (44, 0.0)):
+            self._tag(code, value)
+        for code, value in ((50, 0.0), (51, 0.0), (71, 0), (72, 1000), (73, 1)):
+            self._tag(code, value)
+        for code, value in ((74, 3), (75, 0), (76, 1), (77, 0), (78, 0)):
+            self._tag(code, value)
+        self._tag(0, "ENDTAB")
+        self._table("LTYPE", 1)
+        self._tag(0, "LTYPE")
+        self._tag(2, "CONTINUOUS")
+        self._tag(70, 0)
+        self._tag(3, "Solid line")
+        self._tag(72, 65)
+        self._tag(73, 0)
+        self._tag(40, 0.0)
+        self._tag(0, "ENDTAB")
+        self._table("LAYER", len(layers) + 1)
+        for name, color in {"0": 7, **layers}.items():
+            self._tag(0, "LAYER")
+            self._tag(2, name)
+            self._tag(70, 0)
+            self._tag(62, color)
+            self._tag(6, "CONTINUOUS")
+        self._tag(0, "ENDTAB")
+        self._endsec()
+        if offsets:
+            self._section("BLOCKS")
+            self._tag(0, "BLOCK")
+            self._tag(8, "0")
+            self._tag(2, "BOARD")
+            self._tag(70, 0)
+            self._point(10, (0.0, 0.0))
+            self._tag(3, "BOARD")
+        else:
+            self._section("ENTITIES")
+
+    def _tag(self, code, value):
+        self.file.write(f"{code:>3}\n{value}\n")
+
+    def _point(self, code, point, z=True):
+        self._tag(code, float(point[0]))
+        self._tag(code + 10, float(point[1]))
+        if z:
+            self._tag(code + 20, 0.0)
+
+    def _placeholder(self, name, codes):
+        self.placeholders[name] = []
+        for code in codes:
+            self.file.write(f"{code:>3}\n")
+            self.placeholders[name].append(self.file.tell())
+            self.file.write(f"{0.0:<{_WIDTH}}\n")
+
+    def _section(self, name):
+        self._tag(0, "SECTION")
+        self._tag(2, name)
+
+    def _endsec(self):
+        self._tag(0, "ENDSEC")
+
+    def _table(self, name, count):
+        self._tag(0, "TABLE")
+        self._tag(2, name)
+        self._tag(70, count)
+
+    def _extend(self, point, radius=0.0):
+        self.extmin[0] = min(self.extmin[0], point[0] - radius)
+        self.extmin[1] = min(self.extmin[1], point[1] - radius)
+        self.extmax[0] = max(self.extmax[0], point[0] + radius)
+        self.extmax[1] = max(self.extmax[1], point[1] + radius)
+
+    def _attribs(self, dxfattribs):
+        """output (layer, color) of an entity, layer None if dropped"""
+        dxfattribs = dxfattribs or {}
+        return (self.rename.get(dxfattribs.get("layer", "0")), dxfattribs.get("color"))
+
+    def _entity(self, kind, layer, color=None):
+        self.entities += 1
+        self._tag(0, kind)
+        self._tag(8, layer)
+        if color is not None:
+            self._tag(62, color)
+
+    def add_line(self, start, end, dxfattribs=None):
+        layer, color = self._attribs(dxfattribs)
+        if layer is None:
+            return
+        self._extend(start)
+        self._extend(end)
+        self._entity("LINE", layer, color)
+        self._point(10, start)
+        self._point(11, end)
+
+    def add_circle(self, center, radius, dxfattribs=None):
+        layer, color = self._attribs(dxfattribs)
+        if layer is None:
+            return
+        self._extend(center, radius)
+        self._entity("CIRCLE", layer, color)
+        self._point(10, center)
+        self._tag(40, float(radius))
+
+    def add_lwpolyline(self, points, close=False, dxfattribs=None):
+        """R12 has no LWPOLYLINE, written as 2d POLYLINE"""
+        layer, color = self._attribs(dxfattribs)
+        if layer is None:
+            return
+        self._entity("POLYLINE", layer, color)
+        self._tag(66, 1)
+        self._point(10, (0.0, 0.0))
+        self._tag(70, 1 if close else 0)
+        for point in points:
+            self._extend(point)
+            self._tag(0, "VERTEX")
+            self._tag(8, layer)
+            self._point(10, point)
+        self._tag(0, "SEQEND")
+        self._tag(8, layer)
+
+    def add_polyline2d(self, points, dxfattribs=None):
+        self.add_lwpolyline(points, dxfattribs=dxfattribs)
+
+    def add_text(self, text, height=2.5, dxfattribs=None):
+        layer, color = self._attribs(dxfattribs)
+        # the text of a dropped layer writes nothing on placement
+        return _Text(self, text, height, layer, color)
+
+    def close(self):
+        """ends the file and patches the extents into the header"""
+        if self.entities == 0:
+            self.extmin = [0.0, 0.0]
+            self.extmax = [0.0, 0.0]
+        if self.offsets:
+            self._tag(0, "ENDBLK")
+            self._tag(8, "0")
+            self._endsec()
+            self._section("ENTITIES")
+            for offset in self.offsets:
+                self._tag(0, "INSERT")
+                self._tag(8, "0")
+                self._tag(2, "BOARD")
+                self._point(10, offset)
+            # extents of one copy moved by the offsets
+            self.extmin = [
+                self.extmin[0] + min(x for x, _y in self.offsets),
+                self.extmin[1] + min(y for _x, y in self.offsets),
+            ]
+            self.extmax = [
+                self.extmax[0] + max(x for x, _y in self.offsets),
+                self.extmax[1] + max(y for _x, y in self.offsets),
+            ]
+        self._endsec()
+        self._tag(0, "EOF")
+        center = (
+            (self.extmin[0] + self.extmax[0]) / 2,
+            (self.extmin[1] + self.extmax[1]) / 2,
+        )
+        height = max(self.extmax[1] - self.extmin[1], 1.0)
+        values = {
+            "extmin": (*self.extmin, 0.0),
+            "extmax": (*self.extmax, 0.0),
+            "center": center,
+            "height": (height,),
+        }
+        for name, positions in self.placeholders.items():
+            for position, value in zip(positions, values[name]):
+                self.file.seek(position)
+                self.file.write(f"{float(value):<{_WIDTH}.6f}"[:_WIDTH])
+        self.file.close()
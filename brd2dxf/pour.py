@@ -0,0 +1,192 @@
+"""copper pours: clearance to other nets, thermal reliefs and orphans."""
+
+import math
+import os
+
+import numpy
+import shapely
+
+from .primitives import SEGMENT
+from .union import run_parallel, tile_grid
+
+# isolate 0 means the design rule default
+DEFAULT_ISOLATE = 0.2
+# 20 segments per circle, close to the 18-gons of the copper
+QUAD_SEGS = 5
+# the vertices of a buffer lie on the circle and a corner arc segment spans
+# up to 1.5 quadrant / QUAD_SEGS, clearances are grown by the worst chord
+# sag so the polygon edges keep the full distance
+OUTER = 1 / math.cos(3 * math.pi / (8 * QUAD_SEGS))
+# the pours are filled in tiles of about this many obstacles
+TILE_OBSTACLES = 500
+
+
+def thermal_spokes(pads, isolate, width):
+    """horizontal and vertical spokes through the pad centers over the gap"""
+    boxes = shapely.bounds(pads)
+    x = (boxes[:, 0] + boxes[:, 2]) / 2
+    y = (boxes[:, 1] + boxes[:, 3]) / 2
+    length = numpy.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    length = length / 2 + isolate + width
+    return numpy.concatenate(
+        [
+            shapely.box(x - length, y - width / 2, x + length, y + width / 2),
+            shapely.box(x - width / 2, y - length, x + width / 2, y + length),
+        ]
+    )
+
+
+def pour_tiles(bounds, count):
+    """boxes covering bounds, about TILE_OBSTACLES of the count obstacles each"""
+    minx, miny, maxx, maxy = bounds
+    tiles = max(1, math.ceil(count / TILE_OBSTACLES))
+    size = max(math.sqrt((maxx - minx) * (maxy - miny) / tiles), 1e-3)
+    cols, rows = tile_grid(bounds, size)
+    x = minx + numpy.arange(cols) * size
+    y = miny + numpy.arange(rows) * size
+    x, y = numpy.meshgrid(x, y)
+    return shapely.box(x.ravel(), y.ravel(), x.ravel() + size, y.ravel() + size)
+
+
+def _fill(task):
+    """worker: computes the fill of one pour inside a tile, returns it as wkb
+
+    the region and obstacles reach over the tile, the fill at a point
+    depends on the free area within width only.
+    """
+    tile, region, obstacles, pads, isolate, width, thermals = task
+    tile = shapely.from_wkb(tile)
+    region = shapely.from_wkb(region)
+    obstacles = shapely.from_wkb(obstacles)
+    pads = shapely.from_wkb(pads)
+    # buffering the union is cheaper than the union of the buffers
+    copper = shapely.union_all(obstacles)
+    if width > 0:
+        # the fill is drawn with a pen of width, thinner parts vanish: the
+        # free area is eroded (region shrunk, copper grown by width / 2 more)
+        # and grown back
+        fill = (
+            region.buffer(-width / 2, quad_segs=QUAD_SEGS)
+            .difference(
+                copper.buffer((isolate + width / 2) * OUTER, quad_segs=QUAD_SEGS)
+            )
+            .buffer(width / 2, quad_segs=QUAD_SEGS)
+        )
+    else:
+        fill = region.difference(copper.buffer(isolate * OUTER, quad_segs=QUAD_SEGS))
+    if len(pads):
+        if thermals:
+            gap = shapely.union_all(shapely.buffer(pads, isolate, quad_segs=QUAD_SEGS))
+            spokes = shapely.union_all(thermal_spokes(pads, isolate, width or isolate))
+            spokes = spokes.intersection(gap).intersection(region)
+            # the spokes keep the clearance to the copper near them
+            near = shapely.STRtree(obstacles).query(
+                spokes, predicate="dwithin", distance=isolate
+            )
+            if len(near):
+                spokes = spokes.difference(
+                    shapely.union_all(obstacles[near]).buffer(
+                        isolate * OUTER, quad_segs=QUAD_SEGS
+                    )
+                )
+            fill = shapely.union_all(
+                [fill.difference(gap), spokes, shapely.union_all(pads)]
+            )
+        else:
+            fill = fill.union(shapely.union_all(pads))
+    return shapely.to_wkb(fill.intersection(tile))
+
+
+def compute_pours(pours, stores, frame=None, jobs=0):
+    """computes the copper of the pours, returns {layer: geometry}
+
+    pours are dicts with layer, net, points, width, isolate, thermals and
+    rank, stores maps the copper layers to their PrimitiveStore. the pours
+    are split into tiles, the other net primitives of a tile are found with
+    a spatial index and cut out with the isolate clearance. pours of a lower
+    rank are computed first and are obstacles for the higher ranks, the
+    tiles of the pours of the same rank run in parallel. islands without
+    copper of the own net are dropped.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    layers = {}
+    for layer in {pour["layer"] for pour in pours}:
+        geoms, owners = stores[layer].geometries()
+        layers[layer] = {
+            "geoms": geoms,
+            "tree": shapely.STRtree(geoms),
+            "nets": stores[layer].net_ids(owners),
+            "kinds": stores[layer].primitive_kinds(owners),
+            "fills": [],
+        }
+
+    for rank in sorted({pour["rank"] for pour in pours}):
+        ranked = [pour for pour in pours if pour["rank"] == rank]
+        tasks = []
+        pieces = []
+        owns = []
+        for pour in ranked:
+            data = layers[pour["layer"]]
+            isolate = pour["isolate"] or DEFAULT_ISOLATE
+            width = pour["width"]
+            region = shapely.make_valid(shapely.Polygon(pour["points"]))
+            if frame is not None:
+                region = region.intersection(frame)
+            found = data["tree"].query(region)
+            owns.append(data["geoms"][found[data["nets"][found] == pour["net"]]])
+            fills = [fill for net, fill in data["fills"] if net != pour["net"]]
+            tiles = pour_tiles(region.bounds, len(found) + len(fills))
+            tiles = tiles[shapely.intersects(tiles, region)]
+            pieces.append(len(tiles))
+            # the fill of a tile depends on the free area within width around
+            # it, the windows are twice as wide to keep their edges away
+            windows = shapely.buffer(tiles, 2 * width, join_style="mitre")
+            reaches = shapely.buffer(
+                tiles, (isolate + 2 * width) * OUTER, join_style="mitre"
+            )
+            tile_index, near = data["tree"].query(reaches)
+            for num, (tile, window, reach) in enumerate(zip(tiles, windows, reaches)):
+                found = near[tile_index == num]
+                found.sort()
+                other = found[data["nets"][found] != pour["net"]]
+                pads = found[
+                    (data["nets"][found] == pour["net"])
+                    & (data["kinds"][found] != SEGMENT)
+                ]
+                obstacles = numpy.concatenate(
+                    [
+                        data["geoms"][other],
+                        shapely.intersection(numpy.array(fills, dtype=object), reach),
+                    ]
+                )
+                tasks.append(
+                    (
+                        shapely.to_wkb(tile),
+                        shapely.to_wkb(region.intersection(window)),
+                        shapely.to_wkb(obstacles[~shapely.is_empty(obstacles)]),
+                        shapely.to_wkb(data["geoms"][pads]),
+                        isolate,
+                        width,
+                        pour["thermals"],
+                    )
+                )
+        results = iter(run_parallel(_fill, tasks, jobs))
+        for pour, count, own in zip(ranked, pieces, owns):
+            fill = shapely.union_all(
+                shapely.from_wkb([next(results) for _num in range(count)])
+            )
+            # orphans: islands without copper of the own net
+            parts = shapely.get_parts(fill)
+            if len(own):
+                connected = shapely.STRtree(own).query(parts, predicate="intersects")[0]
+                parts = parts[numpy.unique(connected)]
+            else:
+                parts = parts[:0]
+            layers[pour["layer"]]["fills"].append(
+                (pour["net"], shapely.union_all(parts))
+            )
+
+    return {
+        layer: shapely.union_all([fill for _net, fill in data["fills"]])
+        for layer, data in layers.items()
+    }
@@ -0,0 +1,231 @@
+"""array backed storage of copper primitives."""
+
+import math
+from array import array
+
+import numpy
+import shapely
+
+SEGMENT = 0
+CIRCLE = 1
+RECT = 2
+POLY = 3
+
+_angles = {}
+
+
+def circle_angles(steps):
+    """angles of the points generated by draw_circle()"""
+    if steps not in _angles:
+        angles = []
+        step = math.pi * 2 / steps
+        angle = -step / 2
+        while angle < math.pi * 2 + step:
+            angles.append(angle)
+            angle += step
+        _angles[steps] = numpy.array(angles)
+    return _angles[steps]
+
+
+def _view(data, dtype, columns=0):
+    if not data:
+        return numpy.empty((0, columns) if columns else 0, dtype=dtype)
+    view = numpy.frombuffer(data, dtype=dtype)
+    if columns:
+        view = view.reshape(-1, columns)
+    return view
+
+
+class PrimitiveStore:
+    """stores the copper primitives of one layer in contiguous arrays
+
+    every primitive has a kind, four coordinates (segment endpoints, circle
+    center, rectangle corners), a size (radius), the number of circle steps,
+    the net id and a hidden flag (copper covered by a pour, not part of the
+    layer union). polygon vertices live in a separate vertex array, rings
+    holds the vertex start of each primitive (-1 for non polygons).
+    """
+
+    def __init__(self):
+        self.clear()
+        self.accumulator = None
+        self.budget = 0
+
+    def clear(self):
+        self.kinds = array("b")
+        self.coords = array("d")
+        self.sizes = array("d")
+        self.steps = array("H")
+        self.nets = array("i")
+        self.hidden = array("b")
+        self.rings = array("i")
+        self.vertices = array("d")
+
+    def accumulate(self, accumulator, budget):
+        """hands every budget primitives over to the accumulator (ChunkedUnion)"""
+        self.accumulator = accumulator
+        self.budget = budget
+
+    def flush(self):
+        """moves the stored primitives into the accumulator"""
+        if self.accumulator is not None and len(self.kinds):
+            self.accumulator.add(self.geometries(self.visible())[0])
+            self.clear()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _add(self, kind, x1, y1, x2, y2, size, steps, net, hidden, ring=-1):
+        self.kinds.append(kind)
+        self.coords.extend((x1, y1, x2, y2))
+        self.sizes.append(size)
+        self.steps.append(steps)
+        self.nets.append(net)
+        self.hidden.append(hidden)
+        self.rings.append(ring)
+        if self.budget and len(self.kinds) >= self.budget:
+            self.flush()
+
+    def add_segment(self, x1, y1, x2, y2, radius, net=0, hidden=False):
+        """wire with round caps"""
+        self._add(SEGMENT, x1, y1, x2, y2, radius, 18, net, hidden)
+
+    def add_circle(self, x, y, radius, steps=18, net=0, hidden=False):
+        self._add(CIRCLE, x, y, x, y, radius, steps, net, hidden)
+
+    def add_rect(self, x1, y1, x2, y2, net=0, hidden=False):
+        self._add(RECT, x1, y1, x2, y2, 0.0, 0, net, hidden)
+
+    def add_poly(self, points, net=0, hidden=False):
+        start = len(self.vertices) // 2
+        for point in points:
+            self.vertices.extend(point)
+        xs = self.vertices[start * 2 :: 2]
+        ys = self.vertices[start * 2 + 1 :: 2]
+        self._add(POLY, min(xs), min(ys), max(xs), max(ys), 0.0, 0, net, hidden, start)
+
+    def nbytes(self):
+        return sum(
+            len(data) * data.itemsize
+            for data in (
+                self.kinds,
+                self.coords,
+                self.sizes,
+                self.steps,
+                self.nets,
+                self.hidden,
+                self.rings,
+                self.vertices,
+            )
+        )
+
+    def visible(self):
+        """mask of the primitives that are not hidden"""
+        return _view(self.hidden, "i1") == 0
+
+    def net_ids(self, owners):
+        """net id of every polygon of a geometries() result"""
+        return _view(self.nets, "i4")[owners]
+
+    def primitive_kinds(self, owners):
+        """primitive kind of every polygon of a geometries() result"""
+        return _view(self.kinds, "i1")[owners]
+
+    def geometries(self, select=None):
+        """builds the shapely polygons in bulk
+
+        returns the polygons and the index of the primitive each polygon
+        belongs to (a segment gives two caps and a rectangle).
+        """
+        kinds = _view(self.kinds, "i1")
+        coords = _view(self.coords, "f8", 4)
+        sizes = _view(self.sizes, "f8")
+        steps = _view(self.steps, "u2")
+        index = numpy.arange(len(kinds))
+        if select is not None:
+            index = index[select]
+        parts = []
+        owners = []
+
+        segments = index[kinds[index] == SEGMENT]
+        circles = index[kinds[index] == CIRCLE]
+        cap_owners = numpy.concatenate([circles, segments, segments])
+        cap_centers = numpy.concatenate(
+            [coords[circles, :2], coords[segments, :2], coords[segments, 2:]]
+        )
+        cap_radius = sizes[cap_owners]
+        cap_steps = steps[cap_owners]
+        for num in numpy.unique(cap_steps):
+            mask = cap_steps == num
+            angles = circle_angles(int(num))
+            radius = cap_radius[mask][:, None]
+            ring = numpy.stack(
+                [
+                    cap_centers[mask, 0][:, None] + radius * numpy.sin(angles),
+                    cap_centers[mask, 1][:, None] - radius * numpy.cos(angles),
+                ],
+                axis=-1,
+            )
+            parts.append(shapely.polygons(ring))
+            owners.append(cap_owners[mask])
+
+        if len(segments):
+            p_from = coords[segments, :2]
+            p_to = coords[segments, 2:]
+            radius = sizes[segments][:, None]
+            angle = numpy.arctan2(p_to[:, 1] - p_from[:, 1], p_to[:, 0] - p_from[:, 0])
+            offset_out = numpy.stack([numpy.sin(angle), -numpy.cos(angle)], axis=-1)
+            offset_in = numpy.stack(
+                [numpy.sin(angle + math.pi), -numpy.cos(angle + math.pi)], axis=-1
+            )
+            ring = numpy.stack(
+                [
+                    p_from + radius * offset_in,
+                    p_to + radius * offset_in,
+                    p_to + radius * offset_out,
+                    p_from + radius * offset_out,
+                ],
+                axis=1,
+            )
+            parts.append(shapely.polygons(ring))
+            owners.append(segments)
+
+        rects = index[kinds[index] == RECT]
+        if len(rects):
+            x1, y1, x2, y2 = coords[rects].T
+            ring = numpy.stack(
+                [
+                    numpy.stack([x1, y1], axis=-1),
+                    numpy.stack([x1, y2], axis=-1),
+                    numpy.stack([x2, y2], axis=-1),
+                    numpy.stack([x2, y1], axis=-1),
+                ],
+                axis=1,
+            )
+            parts.append(shapely.polygons(ring))
+            owners.append(rects)
+
+        polys = index[kinds[index] == POLY]
+        if len(polys):
+            rings = _view(self.rings, "i4")
+            vertices = _view(self.vertices, "f8", 2)
+            ends = numpy.append(rings[rings >= 0], len(vertices))
+            ends = dict(zip(ends[:-1].tolist(), ends[1:].tolist()))
+            ring_index = []
+            ring_coords = []
+            for num, start in enumerate(rings[polys].tolist()):
+                ring_coords.append(vertices[start : ends[start]])
+                ring_index.append(numpy.full(ends[start] - start, num))
+            parts.append(
+                shapely.polygons(
+                    shapely.linearrings(
+                        numpy.concatenate(ring_coords),
+                        indices=numpy.concatenate(ring_index),
+                    )
+                )
+            )
+            owners.append(polys)
+
+        if not parts:
+            return (numpy.empty(0, dtype=object), numpy.empty(0, dtype=int))
+        return (numpy.concatenate(parts), numpy.concatenate(owners))
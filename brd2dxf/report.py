@@ -0,0 +1,49 @@
+"""small helpers for memory and timing reports."""
+
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # not on windows, memory is reported as n/a
+    resource = None
+
+enabled = False
+
+
+def memory():
+    """returns (current, peak) resident memory in MB, None if unknown"""
+    if resource is None:
+        return (None, None)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak /= 1024 * 1024 if sys.platform == "darwin" else 1024
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        current = pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        current = peak
+    return (current, peak)
+
+
+def stats(message):
+    """prints a report line, only with --stats"""
+    if enabled:
+        current, peak = memory()
+        if peak is None:
+            print(f"  {message} (mem: n/a)")
+        else:
+            print(f"  {message} (mem: {current:.1f}MB, peak: {peak:.1f}MB)")
+
+
+class Timer:
+    """measures the time of a with-block"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
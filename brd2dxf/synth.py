@@ -0,0 +1,142 @@
+"""synthetic eagle boards for tests and benchmarks."""
+
+import argparse
+import random
+
+LAYERS = [
+    (1, "Top", 4),
+    (16, "Bottom", 1),
+    (17, "Pads", 2),
+    (18, "Vias", 2),
+    (20, "Dimension", 24),
+    (44, "Drills", 7),
+    (45, "Holes", 7),
+    (21, "tPlace", 7),
+    (22, "bPlace", 7),
+    (25, "tNames", 7),
+    (51, "tDocu", 7),
+    (52, "bDocu", 7),
+]
+
+LIBRARIES = """<library name="rcl"><packages><package name="R0805">
+<smd name="1" x="-0.95" y="0" dx="1.3" dy="1.5" layer="1"/>
+<smd name="2" x="0.95" y="0" dx="1.3" dy="1.5" layer="1"/>
+<wire x1="-0.4" y1="0.6" x2="0.4" y2="0.6" width="0.1" layer="51"/>
+<text x="-1" y="1" size="1" layer="25">&gt;NAME</text>
+</package></packages></library>
+<library name="ic"><packages><package name="DIP4">
+<pad name="1" x="-1.27" y="-3.81" drill="0.8" shape="long" rot="R90"/>
+<pad name="2" x="1.27" y="-3.81" drill="0.8" shape="octagon"/>
+<pad name="3" x="1.27" y="3.81" drill="0.8" diameter="1.6"/>
+<pad name="4" x="-1.27" y="3.81" drill="1.0" shape="long" rot="R90"/>
+<wire x1="-2.5" y1="-2.5" x2="2.5" y2="-2.5" width="0.2" layer="21"/>
+<circle x="-1.5" y="-1.5" radius="0.3" width="0.1" layer="21"/>
+<rectangle x1="-0.5" y1="-0.5" x2="0.5" y2="0.5" layer="51"/>
+</package><package name="PIN"><pad name="1" x="0" y="0" drill="1.0"/></package>
+</packages></library>"""
+
+
+def generate(cols, rows, pitch=10.0, seed=1):
+    """board xml with cols x rows parts (smd, dip and single pins)
+
+    neighbour parts are connected by a two segment wire with a via on a
+    random copper layer, every fourth part is on the GND net, which has a
+    pour over the whole Bottom layer.
+    """
+    rnd = random.Random(seed)
+    width = cols * pitch + pitch
+    height = rows * pitch + pitch
+    out = ['<?xml version="1.0" encoding="utf-8"?>']
+    out.append('<eagle version="9.0.1"><drawing><layers>')
+    for number, name, color in LAYERS:
+        out.append(
+            f'<layer number="{number}" name="{name}" color="{color}" '
+            'fill="1" visible="yes" active="yes"/>'
+        )
+    out.append("</layers><board><plain>")
+    for x1, y1, x2, y2 in [
+        (0, 0, width, 0),
+        (width, 0, width, height),
+        (width, height, 0, height),
+        (0, height, 0, 0),
+    ]:
+        out.append(
+            f'<wire x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" width="0" layer="20"/>'
+        )
+    out.append(f"</plain><libraries>{LIBRARIES}</libraries><elements>")
+
+    elements = []
+    for col in range(cols):
+        for row in range(rows):
+            x = pitch + col * pitch
+            y = pitch + row * pitch
+            name = f"E{col}_{row}"
+            kind = (col + row) % 3
+            if kind == 0:
+                rot = rnd.choice(["R0", "R90", "MR0", "MR90", "R180"])
+                library, package, pads = ("rcl", "R0805", ["1", "2"])
+            elif kind == 1:
+                rot = rnd.choice(["R0", "R90", "R270"])
+                library, package, pads = ("ic", "DIP4", ["1", "2", "3", "4"])
+            else:
+                rot = "R0"
+                library, package, pads = ("ic", "PIN", ["1"])
+            out.append(
+                f'<element name="{name}" library="{library}" package="{package}" '
+                f'value="" x="{x}" y="{y}" rot="{rot}"/>'
+            )
+            elements.append((name, x, y, pads))
+    out.append("</elements><signals>")
+
+    out.append('<signal name="GND">')
+    for name, _x, _y, pads in elements[::4]:
+        out.append(f'<contactref element="{name}" pad="{pads[-1]}"/>')
+    out.append(
+        '<polygon width="0.4" layer="16" isolate="0.5">'
+        f'<vertex x="1" y="1"/><vertex x="{width - 1}" y="1"/>'
+        f'<vertex x="{width - 1}" y="{height - 1}"/><vertex x="1" y="{height - 1}"/>'
+        "</polygon>"
+    )
+    out.append('<via x="2" y="2" extent="1-16" drill="0.6"/>')
+    out.append('<via x="3" y="2" extent="1-16" drill="0.6" diameter="1.2"/>')
+    out.append("</signal>")
+    for num in range(len(elements) - 1):
+        first, second = elements[num], elements[num + 1]
+        mx = (first[1] + second[1]) / 2 + rnd.uniform(-3, 3)
+        my = (first[2] + second[2]) / 2 + rnd.uniform(-3, 3)
+        layer = rnd.choice([1, 16])
+        out.append(f'<signal name="N{num}">')
+        out.append(f'<contactref element="{first[0]}" pad="{first[3][0]}"/>')
+        out.append(f'<contactref element="{second[0]}" pad="{second[3][0]}"/>')
+        out.append(
+            f'<wire x1="{first[1]}" y1="{first[2]}" x2="{mx:.3f}" y2="{my:.3f}" '
+            f'width="0.3" layer="{layer}"/>'
+        )
+        out.append(
+            f'<wire x1="{mx:.3f}" y1="{my:.3f}" x2="{second[1]}" y2="{second[2]}" '
+            f'width="0.3" layer="{layer}"/>'
+        )
+        out.append(f'<via x="{mx:.3f}" y="{my:.3f}" extent="1-16" drill="0.4"/>')
+        out.append("</signal>")
+    out.append("</signals></board></drawing></eagle>")
+    return "\n".join(out)
+
+
+def write_board(filename, cols, rows, seed=1):
+    with open(filename, "w") as brd_file:
+        brd_file.write(generate(cols, rows, seed=seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="writes a synthetic eagle board")
+    parser.add_argument("filename", help="brd file", type=str)
+    parser.add_argument("--cols", help="parts per row", type=int, default=12)
+    parser.add_argument("--rows", help="parts per column", type=int, default=8)
+    parser.add_argument("--seed", help="random seed", type=int, default=1)
+    args = parser.parse_args()
+    write_board(args.filename, args.cols, args.rows, args.seed)
+    print(f"{args.filename}: {args.cols * args.rows} parts")
+
+
+if __name__ == "__main__":
+    main()
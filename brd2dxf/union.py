@@ -0,0 +1,247 @@
+"""union strategies for large copper layers."""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import shapely
+
+
+def snap(geoms, grid_size):
+    """rounds the polygons to the precision grid, drops collapsed ones"""
+    geoms = shapely.set_precision(numpy.asarray(geoms), grid_size)
+    return geoms[~shapely.is_empty(geoms)]
+
+
+def _union_wkb(task):
+    """worker: unions a list of wkb polygons, returns the wkb parts"""
+    wkb, grid_size = task
+    union = shapely.union_all(shapely.from_wkb(wkb), grid_size=grid_size)
+    return shapely.to_wkb(shapely.get_parts(union))
+
+
+def _union_nets(task):
+    """worker: unions each wkb polygon list of a batch of nets"""
+    nets, grid_size = task
+    return [_union_wkb((wkb, grid_size)) for wkb in nets]
+
+
+def run_parallel(func, tasks, jobs):
+    """runs func over the tasks, in worker processes if jobs > 1"""
+    if jobs <= 1 or len(tasks) <= 1:
+        return [func(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        return list(executor.map(func, tasks))
+
+
+def tile_grid(bounds, tile_size):
+    """returns the number of (cols, rows) of tiles covering bounds"""
+    minx, miny, maxx, maxy = bounds
+    cols = max(1, math.ceil((maxx - minx) / tile_size))
+    rows = max(1, math.ceil((maxy - miny) / tile_size))
+    return (cols, rows)
+
+
+def tiled_union(geoms, bounds, tile_size, jobs=0, grid_size=None):
+    """unions the polygons tile by tile in parallel and stitches the seams
+
+    every polygon goes to the tile holding the center of its bounding box,
+    so a tile result can reach over the tile border. parts lying completely
+    inside their tile are final unless a part of an other tile overlaps them,
+    all parts crossing a seam are merged again with the parts they touch.
+    """
+    geoms = numpy.asarray(geoms)
+    geoms = geoms[~shapely.is_empty(geoms)]
+    if len(geoms) == 0:
+        return shapely.MultiPolygon()
+    jobs = jobs or os.cpu_count() or 1
+    if bounds is None:
+        bounds = shapely.total_bounds(geoms)
+    minx, miny = bounds[0], bounds[1]
+    cols, rows = tile_grid(bounds, tile_size)
+
+    boxes = shapely.bounds(geoms)
+    col = numpy.clip(((boxes[:, 0] + boxes[:, 2]) / 2 - minx) // tile_size, 0, cols - 1)
+    row = numpy.clip(((boxes[:, 1] + boxes[:, 3]) / 2 - miny) // tile_size, 0, rows - 1)
+    tile = (row * cols + col).astype(int)
+
+    order = numpy.argsort(tile, kind="stable")
+    tiles, starts = numpy.unique(tile[order], return_index=True)
+    wkb = shapely.to_wkb(geoms[order])
+    tasks = [(part, grid_size) for part in numpy.split(wkb, starts[1:])]
+    results = run_parallel(_union_wkb, tasks, jobs)
+
+    parts = []
+    seam = []
+    for num, result in zip(tiles.tolist(), results):
+        tile_minx = minx + (num % cols) * tile_size
+        tile_miny = miny + (num // cols) * tile_size
+        tile_parts = shapely.from_wkb(result)
+        part_boxes = shapely.bounds(tile_parts)
+        # the first and last column/row are open to the outside
+        inside = numpy.ones(len(tile_parts), dtype=bool)
+        if num % cols > 0:
+            inside &= part_boxes[:, 0] > tile_minx
+        if num % cols < cols - 1:
+            inside &= part_boxes[:, 2] < tile_minx + tile_size
+        if num // cols > 0:
+            inside &= part_boxes[:, 1] > tile_miny
+        if num // cols < rows - 1:
+            inside &= part_boxes[:, 3] < tile_miny + tile_size
+        parts.append(tile_parts)
+        seam.append(~inside)
+    parts = numpy.concatenate(parts)
+    seam = numpy.concatenate(seam)
+    if not seam.any():
+        return shapely.MultiPolygon(parts.tolist())
+
+    # stitch: parts crossing a seam and everything they overlap or touch
+    tree = shapely.STRtree(parts)
+    _, touched = tree.query(parts[seam], predicate="intersects")
+    merge = numpy.zeros(len(parts), dtype=bool)
+    merge[touched] = True
+    merge |= seam
+    stitched = shapely.get_parts(shapely.union_all(parts[merge], grid_size=grid_size))
+    return shapely.MultiPolygon(numpy.concatenate([parts[~merge], stitched]).tolist())
+
+
+def spatial_order(geoms):
+    """orders polygons along a morton curve of their bounding box centers"""
+    boxes = shapely.bounds(geoms)
+    centers = numpy.stack(
+        [(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=-1
+    )
+    low = centers.min(axis=0)
+    span = numpy.maximum(centers.max(axis=0) - low, 1e-9)
+    cells = ((centers - low) / span * 0xFFFF).astype(numpy.uint64)
+    code = numpy.zeros(len(geoms), dtype=numpy.uint64)
+    for bit in range(16):
+        for axis in range(2):
+            value = (cells[:, axis] >> numpy.uint64(bit)) & numpy.uint64(1)
+            code |= value << numpy.uint64(bit * 2 + axis)
+    return numpy.argsort(code, kind="stable")
+
+
+class ChunkedUnion:
+    """running union of polygons fed in chunks
+
+    each chunk is sorted along a space filling curve and unioned, then only
+    the parts of the running union it overlaps are merged with it. offsets
+    keeps additional running unions of the buffered polygons, with grid_size
+    the polygons are snapped and unioned on that precision grid.
+    """
+
+    def __init__(self, offsets=(0.0,), grid_size=None):
+        self.grid_size = grid_size
+        self.parts = {offset: numpy.empty(0, dtype=object) for offset in offsets}
+        self.chunks = 0
+        self.polygons = 0
+
+    def add(self, geoms):
+        geoms = numpy.asarray(geoms)
+        geoms = geoms[~shapely.is_empty(geoms)]
+        if len(geoms) == 0:
+            return
+        geoms = geoms[spatial_order(geoms)]
+        self.chunks += 1
+        self.polygons += len(geoms)
+        for offset, parts in self.parts.items():
+            chunk = geoms
+            if offset:
+                chunk = shapely.buffer(geoms, offset, quad_segs=16)
+            if self.grid_size:
+                chunk = snap(chunk, self.grid_size)
+            chunk = shapely.get_parts(
+                shapely.union_all(chunk, grid_size=self.grid_size)
+            )
+            if len(parts):
+                _, touched = shapely.STRtree(parts).query(chunk, predicate="intersects")
+                keep = numpy.ones(len(parts), dtype=bool)
+                keep[touched] = False
+                if not keep.all():
+                    chunk = shapely.get_parts(
+                        shapely.union_all(
+                            numpy.concatenate([parts[~keep], chunk]),
+                            grid_size=self.grid_size,
+                        )
+                    )
+                parts = numpy.concatenate([parts[keep], chunk])
+            else:
+                parts = chunk
+            self.parts[offset] = parts
+
+    def result(self, offset=0.0):
+        return shapely.MultiPolygon(self.parts[offset].tolist())
+
+
+def net_union(geoms, nets, jobs=0, grid_size=None):
+    """unions the polygons net by net in parallel, then combines the nets
+
+    returns the layer union and {net: union of the net}. the nets are
+    independent, only parts of different nets that overlap (clearance
+    violations, offset masks) are merged again.
+    """
+    geoms = numpy.asarray(geoms)
+    keep = ~shapely.is_empty(geoms)
+    geoms = geoms[keep]
+    nets = numpy.asarray(nets)[keep]
+    if len(geoms) == 0:
+        return (shapely.MultiPolygon(), {})
+    jobs = jobs or os.cpu_count() or 1
+    order = numpy.argsort(nets, kind="stable")
+    net_ids, starts = numpy.unique(nets[order], return_index=True)
+    wkb = numpy.split(shapely.to_wkb(geoms[order]), starts[1:])
+    # nets are small, every worker gets a batch of nets of similar size
+    batches = min(jobs * 4, len(wkb)) if len(geoms) > 20000 else 1
+    bounds = numpy.searchsorted(
+        starts, numpy.linspace(0, len(geoms), batches + 1)[1:-1], side="right"
+    )
+    tasks = [
+        (wkb[start:end], grid_size)
+        for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(wkb)])
+    ]
+    results = sum(run_parallel(_union_nets, tasks, jobs), [])
+
+    parts = []
+    owners = []
+    per_net = {}
+    for net, result in zip(net_ids.tolist(), results):
+        net_parts = shapely.from_wkb(result)
+        per_net[net] = shapely.MultiPolygon(net_parts.tolist())
+        parts.append(net_parts)
+        owners.append(numpy.full(len(net_parts), net))
+    parts = numpy.concatenate(parts)
+    owners = numpy.concatenate(owners)
+
+    first, second = shapely.STRtree(parts).query(parts, predicate="intersects")
+    other = owners[first] != owners[second]
+    merge = numpy.zeros(len(parts), dtype=bool)
+    merge[first[other]] = True
+    if not merge.any():
+        return (shapely.MultiPolygon(parts.tolist()), per_net)
+    merged = shapely.get_parts(shapely.union_all(parts[merge], grid_size=grid_size))
+    return (
+        shapely.MultiPolygon(numpy.concatenate([parts[~merge], merged]).tolist()),
+        per_net,
+    )
+
+
+def part_nets(union, per_net):
+    """the parts of a layer union with the nets lying in them
+
+    returns [(part, [net, ..]), ..], a part holds more than one net where
+    the copper of different nets overlaps.
+    """
+    parts = shapely.get_parts(union)
+    nets = list(per_net)
+    net_parts, index = shapely.get_parts(list(per_net.values()), return_index=True)
+    labels = [[] for _part in parts]
+    if len(parts) and len(net_parts):
+        found, part = shapely.STRtree(parts).query_nearest(
+            shapely.point_on_surface(net_parts)
+        )
+        for num, part_num in zip(index[found].tolist(), part.tolist()):
+            if nets[num] not in labels[part_num]:
+                labels[part_num].append(nets[num])
+    return list(zip(parts.tolist(), labels))
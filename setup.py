@@ -16,7 +16,7 @@ setup(
     license='LICENSE',
     description='eagle-cad board (.brd) to dxf converter',
     long_description=open('README.md').read(),
-    install_requires=['ezdxf', 'shapely', 'xmltodict'],
+    install_requires=['ezdxf', 'numpy', 'shapely', 'xmltodict'],
     include_package_data=True,
     data_files = []
 )
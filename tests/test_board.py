@@ -0,0 +1,21 @@
+import os
+
+from brd2dxf.board import load_board, read_board
+from brd2dxf.synth import write_board
+
+
+def test_cache_follows_touched_source(tmp_path, capsys):
+    filename = str(tmp_path / "board.brd")
+    write_board(filename, 2, 2)
+    read_board(filename, cache=True)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    capsys.readouterr()
+
+    read_board(filename, cache=True)
+    assert "unchanged content" in capsys.readouterr().out
+    _board, source = load_board(f"{filename}.cache")
+    assert source["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+    read_board(filename, cache=True)
+    assert capsys.readouterr().out == f"using board cache: {filename}.cache\n"
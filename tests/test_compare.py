@@ -0,0 +1,69 @@
+import subprocess
+import sys
+
+import pytest
+
+from brd2dxf.bench import VARIANTS
+from brd2dxf.compare import compare, load_dxf, region
+from brd2dxf.synth import generate
+
+
+def ring(*points):
+    """segments of the closed ring through points"""
+    return [(*a, *b) for a, b in zip(points, points[1:] + points[:1])]
+
+
+def square(x, y, size):
+    return ring((x, y), (x + size, y), (x + size, y + size), (x, y + size))
+
+
+def test_region_of_touching_outlines():
+    # a shared edge and a shared corner
+    segments = square(0, 0, 1) + square(1, 0, 1) + square(2, 1, 1)
+    result = region(segments)
+    assert result.area == pytest.approx(3)
+    assert len(result.geoms) == 2
+
+
+def test_region_of_a_ring_with_a_hole():
+    result = region(square(0, 0, 10) + square(3, 3, 4))
+    assert result.area == pytest.approx(84)
+    assert len(result.interiors) == 1
+
+
+def test_region_ignores_ring_order_and_direction():
+    segments = square(0, 0, 10) + square(3, 3, 4) + square(20, 0, 2)
+    expected = region(segments)
+    reverse = [(x2, y2, x1, y1) for x1, y1, x2, y2 in reversed(segments)]
+    assert region(reverse).symmetric_difference(expected).area < 1e-9
+    assert region(segments[4:] + segments[:4]).equals(expected)
+
+
+def convert(board, output, *args):
+    command = [sys.executable, "-m", "brd2dxf", board, "--output", output, *args]
+    subprocess.run(command, check=True, capture_output=True)
+    return load_dxf(output)
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("compare")
+    board = workdir / "board.brd"
+    board.write_text(generate(3, 2))
+    return board, convert(board, workdir / "reference.dxf")
+
+
+@pytest.mark.parametrize(
+    "name, args, ignore, tolerances",
+    [
+        variant
+        for variant in VARIANTS
+        if variant[0] in ("flat", "tile", "chunk", "stream")
+    ],
+)
+def test_variant_matches_reference(reference, tmp_path, name, args, ignore, tolerances):
+    board, reference = reference
+    output = convert(board, tmp_path / f"{name}.dxf", *args)
+    results = compare(reference, output, ignore=ignore, **tolerances)
+    assert results
+    assert [result["layer"] for result in results if not result["ok"]] == []
@@ -0,0 +1,52 @@
+import json
+
+import numpy
+import shapely
+
+from brd2dxf.drc import check_layer, write_report
+
+
+def boxes(gap, nets):
+    """two 1mm squares gap apart"""
+    geoms = numpy.array([shapely.box(0, 0, 1, 1), shapely.box(1 + gap, 0, 2 + gap, 1)])
+    return geoms, numpy.array(nets)
+
+
+def test_clearance_just_inside_is_reported():
+    geoms, nets = boxes(0.199, [1, 2])
+    violations = check_layer("Top", geoms, nets, ["", "A", "B"], 0.2)
+    assert len(violations) == 1
+    assert violations[0]["nets"] == ["A", "B"]
+    assert violations[0]["distance"] == 0.199
+    assert violations[0]["x"] == 1.0995
+
+
+def test_clearance_just_outside_is_not_reported():
+    geoms, nets = boxes(0.201, [1, 2])
+    assert check_layer("Top", geoms, nets, ["", "A", "B"], 0.2) == []
+
+
+def test_same_net_overlap_is_not_reported():
+    geoms, nets = boxes(-0.5, [1, 1])
+    assert check_layer("Top", geoms, nets, ["", "A"], 0.2) == []
+    # the same overlap between two nets is a short
+    geoms, nets = boxes(-0.5, [1, 2])
+    [violation] = check_layer("Top", geoms, nets, ["", "A", "B"], 0.2)
+    assert violation["distance"] == 0
+
+
+def test_report_json(tmp_path):
+    geoms, nets = boxes(0.1, [1, 2])
+    violations = check_layer("Bottom", geoms, nets, ["", "A", "B"], 0.2)
+    filename = tmp_path / "drc.json"
+    write_report(filename, 0.2, violations)
+    report = json.loads(filename.read_text())
+    assert report["clearance"] == 0.2
+    [violation] = report["violations"]
+    assert set(violation) == {"layer", "nets", "distance", "x", "y"}
+    assert violation["layer"] == "Bottom"
+    assert violation["nets"] == ["A", "B"]
+    assert violation["distance"] == 0.1
+    assert violation["x"] == 1.05
+    # on the facing edges
+    assert 0 <= violation["y"] <= 1
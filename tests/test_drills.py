@@ -0,0 +1,64 @@
+import math
+import random
+import time
+
+from brd2dxf.drills import DrillTable, Grid, nearest_neighbour_tour, travel
+
+
+def test_single_hole():
+    assert nearest_neighbour_tour([(40.0, 30.0)]) == [0]
+
+
+def test_close_pair_far_from_start():
+    points = [(100.05, 100.0), (100.0, 100.0)]
+    assert nearest_neighbour_tour(points) == [1, 0]
+
+
+def test_cluster_far_from_start():
+    points = [(100.0 + num * 0.01, 100.0) for num in range(10)]
+    order = nearest_neighbour_tour(points)
+    assert order == list(range(10))
+
+
+def test_grid_scan_fallback():
+    points = [(0.0, 0.0), (0.001, 0.0), (500.0, 500.0)]
+    grid = Grid(points, 1e-3)
+    assert grid.nearest(400.0, 400.0) == [2]
+    assert grid.nearest(0.0, 0.0, 2) == [0, 1]
+
+
+def test_optimize_mounting_hole():
+    table = DrillTable()
+    for num in range(20):
+        table.add(5.0 + num * 2.54, 10.0, 0.8)
+    table.add(40.0, 30.0, 3.0)
+    table.add(40.0, 30.0, 3.0)
+    tools, (before, after) = table.optimize()
+    assert [diameter for diameter, _points in tools] == [0.8, 3.0]
+    assert tools[1][1] == [(40.0, 30.0)]
+    assert len(tools[0][1]) == 20
+    assert after <= before
+
+
+def test_tour_not_longer_than_file_order():
+    points = [(math.cos(num) * 50, math.sin(num * 1.7) * 30) for num in range(200)]
+    order = nearest_neighbour_tour(points)
+    assert sorted(order) == list(range(200))
+    assert travel(points, order) < travel(points, range(200))
+
+
+def test_optimize_20k_holes():
+    rnd = random.Random(1)
+    table = DrillTable()
+    for _num in range(10000):
+        table.add(rnd.uniform(0, 400), rnd.uniform(0, 300), 0.8)
+    # a panel: dense groups of holes
+    for _group in range(20):
+        x, y = rnd.uniform(0, 400), rnd.uniform(0, 300)
+        for _num in range(500):
+            table.add(rnd.gauss(x, 1.0), rnd.gauss(y, 1.0), 0.8)
+    started = time.perf_counter()
+    tools, (before, after) = table.optimize()
+    assert time.perf_counter() - started < 15
+    assert len(tools[0][1]) == len(table.unique())
+    assert after < before / 10
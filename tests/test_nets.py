@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import ezdxf
+
+from brd2dxf.synth import write_board
+
+
+def layers(board, output, *args):
+    subprocess.run(
+        [sys.executable, "-m", "brd2dxf", board, "--output", output, *args],
+        check=True,
+        capture_output=True,
+    )
+    return {entity.dxf.layer for entity in ezdxf.readfile(output).modelspace()}
+
+
+def test_net_layers(tmp_path):
+    board = str(tmp_path / "board.brd")
+    write_board(board, 3, 2)
+    found = layers(board, str(tmp_path / "nets.dxf"), "--nets", "layers")
+    assert {"Top_GND", "Top_N0"} <= found
+    # unconnected pads are no nets
+    assert not [layer for layer in found if "." in layer]
+
+    found = layers(
+        board, str(tmp_path / "top.dxf"), "--nets", "layers", "--layer", "Top"
+    )
+    assert "Top_N0" in found
+    assert all(layer == "Top" or layer.startswith("Top_") for layer in found)
@@ -0,0 +1,118 @@
+import subprocess
+import sys
+
+import ezdxf
+import shapely
+
+from brd2dxf.pour import compute_pours
+from brd2dxf.primitives import PrimitiveStore
+from brd2dxf.synth import generate
+
+SQUARE = [(0, 0), (20, 0), (20, 20), (0, 20)]
+
+
+def pour(net, points=SQUARE, rank=1, isolate=0.3, width=0.4, thermals=True):
+    return {
+        "layer": "Top",
+        "net": net,
+        "points": points,
+        "width": width,
+        "isolate": isolate,
+        "thermals": thermals,
+        "rank": rank,
+    }
+
+
+def fill(store, *pours):
+    return compute_pours(list(pours), {"Top": store}, jobs=1)["Top"]
+
+
+def test_fill_keeps_clearance_to_other_nets():
+    store = PrimitiveStore()
+    store.add_circle(3, 3, 0.8, net=1)
+    store.add_segment(2, 10, 18, 12, 0.5, net=2)
+    store.add_rect(12, 2, 14, 5, net=2)
+    store.add_circle(6, 15, 1.0, steps=8, net=2)
+    result = fill(store, pour(1))
+    assert result.area > 300
+    geoms, owners = store.geometries()
+    other = shapely.union_all(geoms[store.net_ids(owners) == 2])
+    assert result.distance(other) >= 0.3 - 1e-9
+
+
+def test_spokes_connect_same_net_pads():
+    store = PrimitiveStore()
+    store.add_circle(5, 5, 1.0, net=1)
+    store.add_rect(14, 14, 16, 16, net=1)
+    result = fill(store, pour(1))
+    # one island holding both pads
+    assert isinstance(result, shapely.Polygon)
+    assert result.contains(shapely.Point(5, 5))
+    assert result.contains(shapely.Point(15, 15))
+    # the gap around the pad is open except for the spokes
+    ring = shapely.Point(5, 5).buffer(1.2).difference(shapely.Point(5, 5).buffer(1.05))
+    assert 0 < result.intersection(ring).area < ring.area / 2
+
+
+def test_orphans_are_dropped():
+    store = PrimitiveStore()
+    store.add_circle(5, 5, 1.0, net=1)
+    # a wall of an other net cuts the pour in two
+    store.add_segment(10, -1, 10, 21, 0.5, net=2)
+    result = fill(store, pour(1))
+    assert result.bounds[2] < 10
+    assert result.area > 150
+
+
+def test_no_own_copper_no_fill():
+    store = PrimitiveStore()
+    store.add_circle(5, 5, 1.0, net=2)
+    assert fill(store, pour(1)).is_empty
+
+
+def test_lower_rank_blocks_higher_rank():
+    left = [(0, 0), (15, 0), (15, 20), (0, 20)]
+    right = [(5, 0), (20, 0), (20, 20), (5, 20)]
+    store = PrimitiveStore()
+    store.add_circle(2, 10, 1.0, net=1)
+    store.add_circle(18, 10, 1.0, net=2)
+    for first, second, edge in [(1, 2, 15), (2, 1, 5)]:
+        result = fill(store, pour(1, left, rank=first), pour(2, right, rank=second))
+        net1, net2 = sorted(shapely.get_parts(result), key=lambda part: part.bounds)
+        assert net1.distance(net2) >= 0.3 - 1e-9
+        # the lower rank keeps its full outline
+        if first < second:
+            assert abs(net1.bounds[2] - edge) < 1e-6
+        else:
+            assert abs(net2.bounds[0] - edge) < 1e-6
+
+
+ROUTE2 = (
+    '<layer number="2" name="Route2" color="1" fill="1" visible="yes" active="yes"/>'
+)
+# reaches over the 30mm board
+OVERHANG = (
+    '<polygon width="0.4" layer="2" isolate="0.3">'
+    '<vertex x="20" y="5"/><vertex x="40" y="5"/>'
+    '<vertex x="40" y="25"/><vertex x="20" y="25"/></polygon>'
+)
+
+
+def test_pours_outline_is_clipped_outline(tmp_path):
+    board = tmp_path / "board.brd"
+    xml = generate(2, 2)
+    xml = xml.replace('<layer number="16"', ROUTE2 + '<layer number="16"')
+    xml = xml.replace('<signal name="N0">', '<signal name="N0">' + OVERHANG)
+    board.write_text(xml)
+    output = tmp_path / "out.dxf"
+    command = [sys.executable, "-m", "brd2dxf", board, "--output", output]
+    subprocess.run(command + ["--pours", "outline"], check=True, capture_output=True)
+    msp = ezdxf.readfile(output).modelspace()
+    outlines = [("Route2Poly", (20, 5, 30, 25)), ("BottomPoly", (1, 1, 29, 29))]
+    for layer, box in outlines:
+        lines = [
+            shapely.LineString([line.dxf.start.vec2, line.dxf.end.vec2])
+            for line in msp.query(f'LINE[layer=="{layer}"]')
+        ]
+        outline = shapely.polygonize(lines)
+        assert outline.symmetric_difference(shapely.box(*box)).area < 1e-6
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import ezdxf
+
+from brd2dxf.synth import generate
+
+ROUTE2 = (
+    '<layer number="2" name="Route2" color="1" fill="1" visible="yes" active="yes"/>'
+)
+POUR = (
+    '<wire x1="10" y1="10" x2="20" y2="12" width="0.3" layer="2"/>'
+    '<polygon width="0.4" layer="2" isolate="0.3">'
+    '<vertex x="5" y="5"/><vertex x="25" y="5"/>'
+    '<vertex x="25" y="25"/><vertex x="5" y="25"/></polygon>'
+)
+
+
+def convert(board, output, *args):
+    subprocess.run(
+        [sys.executable, "-m", "brd2dxf", board, "--output", output, *args],
+        check=True,
+        capture_output=True,
+    )
+    return ezdxf.readfile(output).modelspace()
+
+
+def test_stream_writes_inner_layer_pours(tmp_path):
+    board = tmp_path / "route2.brd"
+    xml = generate(2, 2)
+    xml = xml.replace('<layer number="16"', ROUTE2 + '<layer number="16"')
+    xml = xml.replace('<signal name="N0">', '<signal name="N0">' + POUR)
+    board.write_text(xml)
+    for args in [(), ("--stream",)]:
+        msp = convert(str(board), str(tmp_path / "out.dxf"), *args)
+        assert len(msp.query('*[layer=="Route2Poly"]')) > 4
+
+
+def test_stream_panel_inserts_one_block(tmp_path):
+    board = tmp_path / "board.brd"
+    board.write_text(generate(2, 2))
+    single = convert(str(board), str(tmp_path / "single.dxf"), "--stream")
+    msp = convert(str(board), str(tmp_path / "panel.dxf"), "--stream", "--panel", "3x2")
+    inserts = msp.query("INSERT")
+    assert len(msp) == len(inserts) == 6
+    assert {insert.dxf.name for insert in inserts} == {"BOARD"}
+    assert len(msp.doc.blocks.get("BOARD")) == len(single)